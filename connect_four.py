@@ -4,21 +4,35 @@ import pygame
 import math
 import matplotlib.pyplot as plt
 
-from copy import deepcopy as dcp
-
+from project_02.book import OpeningBook
+from project_02.evaluation import WindowEvaluator
 from project_02.forest import Tree, Node
+from project_02.mcts import MonteCarloTreeSearch
+from project_02.position import Position
+from project_02.search import AlphaBetaSearch, EndgameSolver, ParallelSearch, SearchTimeout, TranspositionTable
 
 class ConnectFour:
 
-    def __init__(self, x_size=7, y_size=6, print_every_move=False):
+    def __init__(self, x_size=7, y_size=6, print_every_move=False, evaluation="directions", workers=None,
+                 endgame_threshold=16, k=4):
         """Setup a fresh game of connect four
 
         :param x_size: Sets up the x axis length for the game field.
         :param y_size: Sets up the y axis length for the game field.
+        :param evaluation: Evaluation of the leaves of the tree search of MMV moves (search="tree"), one of:
+                            - directions: get_state_value of the game field (default).
+                            - windows: Value of the windows of k cells, kept up to date with every move. Much
+                                       faster, but values positions differently, so MMV moves may change.
+                           The alphabeta and parallel searches and the opening book always use the windows value.
+        :param workers: Number of processes of the parallel search (defaults to the number of CPUs).
+        :param endgame_threshold: MMV moves of positions with at most this many empty cells are solved to the end
+                                  of the game (None to always search with the given depth).
+        :param k: Number of tokens in a line that win the game.
         """
 
         self.y_size = y_size
         self.x_size = x_size
+        self.k = k
 
         # Game field initialization
         self.game_field = np.zeros((self.y_size, self.x_size), dtype=int)
@@ -26,6 +40,9 @@ class ConnectFour:
         # Helper dict to keep track of played tokens
         self.offset = {c: self.y_size-1 for c in range(0, self.x_size)}
 
+        # Bitboard representation of the game field (used for win detection and search)
+        self.position = Position(self.x_size, self.y_size, self.k)
+
         # Symbol mapping
         self.symbols = {1: 'Y', -1: 'R', 0: ' '}
 
@@ -79,6 +96,34 @@ class ConnectFour:
 
         self.game_tree = None
 
+        if evaluation not in ("windows", "directions"):
+            raise Exception("Invalid value for evaluation: '{}'".format(evaluation))
+        self.evaluation = evaluation
+
+        # Alpha beta search for MMV moves, its transposition table is kept for all moves and games of the instance.
+        # Leaves are valued with the windows value of the position, get_state_value is far too slow for deep searches
+        self.transposition_table = TranspositionTable()
+        self.alpha_beta = AlphaBetaSearch(evaluate=lambda position: position.threat_value,
+                                          x_size=self.x_size,
+                                          transposition_table=self.transposition_table)
+
+        # Windows evaluation of all leaves of the tree search at once (see move_tree_data)
+        self.window_evaluator = WindowEvaluator(self.x_size, self.y_size, self.k)
+
+        # Monte Carlo tree search for MCTS moves, its tree is reused for the following moves
+        self.mcts = MonteCarloTreeSearch()
+
+        # Solver for MMV moves of positions with few empty cells
+        self.endgame_threshold = endgame_threshold
+        self.endgame_solver = EndgameSolver(x_size=self.x_size)
+
+        # Opening book that is used for MMV moves before searching (see load_opening_book)
+        self.opening_book = None
+
+        # Parallel search for MMV moves, its process pool is started with the first search and kept for all games
+        # until close is called (or the with block of the game ends), play_a_tournament closes it when done
+        self.parallel_search = ParallelSearch(self.x_size, self.y_size, self.k, workers=workers, split_depth=2)
+
     def move_allowed(self, column):
         """Checks if a move is allowed
 
@@ -90,34 +135,30 @@ class ConnectFour:
             return False
 
     def winning_move(self, column):
-        """Checks if a move was a winning move
+        """Checks if a move was a winning move and counts its direction in self.stats.
 
-        :param column: Column to put the token
-        """
-
-        results = self.check_all_directions(column=column)
-
-        if max(results) >= 4:
-            i = results.index(max(results))
+        Only used for moves of the game, searches check wins with Position.last_move_won.
 
-            if i in [0, 1, 2]:
-                self.stats['win_direction']['h'] += 1
-
-            elif i == 3:
-                self.stats['win_direction']['v'] += 1
+        :param column: Column the token was put in
+        """
 
-            elif i in [5, 6, 7]:
-                self.stats['win_direction']['d'] += 1
+        directions = self.position.winning_directions(self.player)
 
-            elif i in [4, 8, 9]:
-                self.stats['win_direction']['i'] += 1
+        if directions:
+            self.stats['win_direction'][directions[0]] += 1
 
             return True
         else:
             return False
 
-    def check_all_directions(self, column, row=None, target_player=None):
-        """Calls the value calculation for a given token."""
+    def check_all_directions(self, column, row=None, target_player=None, game_field=None):
+        """Calls the value calculation for a given token.
+
+        :param column: Column of the token.
+        :param row: Row of the token (defaults to the offset of the column).
+        :param target_player: Determines for which player the value should be calculated.
+        :param game_field: Game field to look at (defaults to self.game_field).
+        """
 
         actual_game = False if target_player is not None else True
         row = row if row is not None else self.offset[column]
@@ -155,7 +196,7 @@ class ConnectFour:
 
         # Check Right
         if right:
-            count, value, free = self._token_count(row, column + 1, horizontal_transit=1, target_player=target_player)
+            count, value, free = self._token_count(row, column + 1, horizontal_transit=1, target_player=target_player, game_field=game_field)
             tokens['r'] += count
 
             # right calculation data
@@ -168,7 +209,7 @@ class ConnectFour:
 
         # Check left
         if left:
-            count, value, free = self._token_count(row, column - 1, horizontal_transit=-1, target_player=target_player)
+            count, value, free = self._token_count(row, column - 1, horizontal_transit=-1, target_player=target_player, game_field=game_field)
             tokens['l'] = count
 
             if not actual_game:
@@ -186,7 +227,7 @@ class ConnectFour:
 
         # Check down
         if down:
-            count, value, free = self._token_count(row + 1, column, vertical_transit=1, target_player=target_player)
+            count, value, free = self._token_count(row + 1, column, vertical_transit=1, target_player=target_player, game_field=game_field)
             tokens['d'] = count
 
             if not actual_game:
@@ -198,7 +239,7 @@ class ConnectFour:
 
         # Check Top-Right
         if right and up:
-            count, value, free = self._token_count(row - 1, column + 1, vertical_transit=-1, horizontal_transit=+1, target_player=target_player)
+            count, value, free = self._token_count(row - 1, column + 1, vertical_transit=-1, horizontal_transit=+1, target_player=target_player, game_field=game_field)
             tokens['ru'] = count
 
             if not actual_game:
@@ -210,7 +251,7 @@ class ConnectFour:
 
         # Check Top-Left
         if left and up:
-            count, value, free = self._token_count(row - 1, column - 1, vertical_transit=-1, horizontal_transit=-1, target_player=target_player)
+            count, value, free = self._token_count(row - 1, column - 1, vertical_transit=-1, horizontal_transit=-1, target_player=target_player, game_field=game_field)
             tokens['lu'] = count
 
             if not actual_game:
@@ -222,7 +263,7 @@ class ConnectFour:
 
         # Check Bottom-Right
         if right and down:
-            count, value, free = self._token_count(row + 1, column + 1, vertical_transit=1, horizontal_transit=1, target_player=target_player)
+            count, value, free = self._token_count(row + 1, column + 1, vertical_transit=1, horizontal_transit=1, target_player=target_player, game_field=game_field)
             tokens['rd'] = count
 
             if not actual_game:
@@ -240,7 +281,7 @@ class ConnectFour:
 
         # Check Bottom-Left
         if left and down:
-            count, value, free = self._token_count(row + 1, column - 1, vertical_transit=1, horizontal_transit=-1, target_player=target_player)
+            count, value, free = self._token_count(row + 1, column - 1, vertical_transit=1, horizontal_transit=-1, target_player=target_player, game_field=game_field)
             tokens['ld'] = count
 
             if not actual_game:
@@ -257,7 +298,7 @@ class ConnectFour:
             results.append(tokens['ru'] + tokens['ld'] + 1)
 
         if not actual_game and up:
-            count, value, free = self._token_count(row - 1, column, vertical_transit=-1, target_player=target_player)
+            count, value, free = self._token_count(row - 1, column, vertical_transit=-1, target_player=target_player, game_field=game_field)
 
             token_values['u'].append(value)
             token_values['u'].append(free)
@@ -270,7 +311,8 @@ class ConnectFour:
 
         return results if target_player is None else token_values
 
-    def _token_count(self, row, column, vertical_transit=0, horizontal_transit=0, target_player=None):
+    def _token_count(self, row, column, vertical_transit=0, horizontal_transit=0, target_player=None,
+                     game_field=None):
         """Helper function that counts tokens.
 
         :param row: Row to start counting.
@@ -278,8 +320,10 @@ class ConnectFour:
         :param vertical_transit: Transition value for a vertical transition.
         :param horizontal_transit: Transition value for a horizontal transition.
         :param target_player: Determines for which player the value should be calculated.
+        :param game_field: Game field to count on (defaults to self.game_field).
 
         :returns: An int value of counted tokens (in line)"""
+        field = game_field if game_field is not None else self.game_field
         count = 0
         connected = True
         value = 0
@@ -288,9 +332,9 @@ class ConnectFour:
         actual_game = False if target_player is not None else True
         target_player = target_player if target_player is not None else self.player
 
-        for i in range(0, 3):
+        for i in range(0, self.k - 1):
             if row in range(0, self.y_size) and column in range(0, self.x_size):
-                if self.game_field[row][column] == target_player:
+                if field[row][column] == target_player:
                     value += 1
 
                     if connected:
@@ -299,7 +343,7 @@ class ConnectFour:
                     column += horizontal_transit
                     row += vertical_transit
 
-                elif not actual_game and self.game_field[row][column] == 0:
+                elif not actual_game and field[row][column] == 0:
                     # Free field
                     connected = False
                     free_fields += 1
@@ -324,6 +368,7 @@ class ConnectFour:
         if self.move_allowed(column):
             # Put token
             self.game_field[self.offset[column]][column] = self.player
+            self.position.make(column)
 
             self.player_stats[self.player]['used_columns'][column] += 1
             self.player_stats[self.player]['turns_played'] += 1
@@ -342,8 +387,8 @@ class ConnectFour:
                 # Switch player
                 self.player *= -1
 
-            # Determines if the game is a draw
-            if 0 not in self.game_field:
+            # Determines if the game is a draw (a win with the last free cell is no draw)
+            if not self.game_finished and self.position.is_full():
                 self.game_finished = True
                 self.is_draw = True
 
@@ -367,10 +412,21 @@ class ConnectFour:
             cp_field[cp_field == n] = self.symbols[n]
         print(cp_field)
 
+    def close(self):
+        """Stops the process pool of the parallel search (it is started again by the next parallel search)."""
+        self.parallel_search.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def reset_game(self):
         """Resets the game state."""
         self.game_field = np.zeros((self.y_size, self.x_size), dtype=int)
         self.offset = {c: self.y_size-1 for c in range(0, self.x_size)}
+        self.position = Position(self.x_size, self.y_size, self.k)
         self.player = 1
         self.game_finished = False
         self.is_draw = False
@@ -387,18 +443,26 @@ class ConnectFour:
             },
         }
 
-    def play_a_game(self, use_mmv=False, mmv_player=1, winners_print=True):
+    def play_a_game(self, use_mmv=False, mmv_player=1, winners_print=True, search="tree", max_depth=2,
+                    time_budget=None, use_mcts=False, mcts_player=-1, playouts=1000):
         """Two players can play a game.
 
         :param use_mmv: Flag that states if MMV should be used as move for Y.
         :param mmv_player: Player that should use MMV (defaults to 1)
         :param winners_print: Bool to determine if winning game_field should be printed.
+        :param search: Search used for MMV moves (see make_mmv_move).
+        :param max_depth: Depth used for MMV moves (see make_mmv_move).
+        :param time_budget: Time budget in milliseconds for every MMV and MCTS move (see make_mmv_move).
+        :param use_mcts: Flag that states if MCTS should be used as move for mcts_player.
+        :param mcts_player: Player that should use MCTS (defaults to -1)
+        :param playouts: Number of playouts for MCTS moves without time budget (see make_mcts_move).
 
         :returns: Tuple of (Player who had last turn, bool if game was a draw)
         """
 
-        if mmv_player not in (-1, 1):
-            raise Exception("The given Player {} does not exist. Please use -1 or 1.".format(mmv_player))
+        for strategy_player in (mmv_player, mcts_player):
+            if strategy_player not in (-1, 1):
+                raise Exception("The given Player {} does not exist. Please use -1 or 1.".format(strategy_player))
 
         if self.game_finished:
             self.print_game_field()
@@ -410,13 +474,15 @@ class ConnectFour:
         else:
             while not self.game_finished:
                 if use_mmv and self.player == mmv_player:
-                    self.make_mmv_move()
+                    self.make_mmv_move(player=self.player, max_depth=max_depth, search=search,
+                                       time_budget=time_budget)
+                elif use_mcts and self.player == mcts_player:
+                    self.make_mcts_move(playouts=playouts, time_budget=time_budget)
                 else:
                     self.random_move()
 
             if self.game_finished:
 
-                self.stats['winning_player'][self.player] += 1
                 self.stats['win_turn_count'].append(self.player_stats[self.player]['turns_played'])
 
                 for key, value in self.player_stats[self.player]['used_columns'].items():
@@ -425,6 +491,7 @@ class ConnectFour:
                 if self.is_draw:
                     self.stats['draw'] += 1
                 else:
+                    self.stats['winning_player'][self.player] += 1
                     self.stats['win_moves'].append(self.player_stats[self.player]['move_hist'])
 
                 if winners_print:
@@ -436,13 +503,20 @@ class ConnectFour:
 
         return self.player, self.is_draw
 
-    def play_a_tournament(self, use_mmv=False, mmv_player=1, laps=1000, modulo=100):
+    def play_a_tournament(self, use_mmv=False, mmv_player=1, laps=1000, modulo=100, search="tree", max_depth=2,
+                          time_budget=None, use_mcts=False, mcts_player=-1, playouts=1000):
         """Lets two NPC players play a random tournament.
 
         :param use_mmv: Flag that states if MMV should be used as move for Y.
         :param mmv_player: Player that should use MMV (defaults to 1)
         :param laps: determines how many laps should be played.
         :param modulo: Modulo value for iterative printing
+        :param search: Search used for MMV moves (see make_mmv_move).
+        :param max_depth: Depth used for MMV moves (see make_mmv_move).
+        :param time_budget: Time budget in milliseconds for every MMV and MCTS move (see make_mmv_move).
+        :param use_mcts: Flag that states if MCTS should be used as move for mcts_player.
+        :param mcts_player: Player that should use MCTS (defaults to -1)
+        :param playouts: Number of playouts for MCTS moves without time budget (see make_mcts_move).
         """
         tournament_statistics = {
             1: 0,   # Wins of player 1
@@ -451,7 +525,9 @@ class ConnectFour:
         }
 
         for l in range(0, laps):
-            winner, draw = self.play_a_game(use_mmv=use_mmv, mmv_player=mmv_player, winners_print=False)
+            winner, draw = self.play_a_game(use_mmv=use_mmv, mmv_player=mmv_player, winners_print=False,
+                                            search=search, max_depth=max_depth, time_budget=time_budget,
+                                            use_mcts=use_mcts, mcts_player=mcts_player, playouts=playouts)
             if draw:
                 tournament_statistics[0] += 1
             else:
@@ -465,6 +541,133 @@ class ConnectFour:
                                                                              tournament_statistics[0]))
             self.reset_game()
 
+        # Stop the workers of the parallel search, the next search starts them again
+        self.close()
+
+        print("Tournament results in: \n'{}'\t{}\n'{}'\t{}\nDRAW\t{}".format(self.symbols[1],
+                                                                             tournament_statistics[1],
+                                                                             self.symbols[-1],
+                                                                             tournament_statistics[-1],
+                                                                             tournament_statistics[0]))
+
+        return tournament_statistics
+
+    def play_a_batch_tournament(self, laps=1000000, batch_size=100000, print_batches=True, record_moves=False):
+        """Lets two random players play a tournament where a whole batch of games is simulated at once.
+
+        Every game of a batch is an array of the token sums of all lines (Position.windows) and an array of column
+        heights. Move selection, the moves and the win detection are done with vectorized operations over all
+        running games of the batch, only the sums of the lines through the new token are updated and checked.
+        self.stats is updated like play_a_game does it.
+
+        :param laps: Number of laps to play at the tournament.
+        :param batch_size: Number of games that are simulated at once.
+        :param print_batches: Flag to print the state of the tournament after every batch.
+        :param record_moves: Flag to append the columns of the winner of every game to self.stats['win_moves'].
+
+        :returns: Stats dict for this tournament.
+        """
+        shift = self.y_size + 1
+        cells = self.x_size * self.y_size
+        bits = self.x_size * shift
+
+        # Lines through every cell, padded with an additional line (its entries are masked out by cell_line_mask)
+        number_of_lines = len(self.position.windows) + 1
+        cell_lines = self.position.cell_windows
+        cell_line_table = np.full((bits, max(len(cell) for cell in cell_lines)), number_of_lines - 1)
+        for bit, cell in enumerate(cell_lines):
+            cell_line_table[bit, :len(cell)] = cell
+        cell_line_mask = cell_line_table < number_of_lines - 1
+
+        # Direction of every line, lines are ordered by direction like self.position.shifts
+        directions = list(self.position.shifts.keys())
+        line_directions = np.array([directions.index(next(direction for direction, direction_shift
+                                                          in self.position.shifts.items()
+                                                          if line[1] - line[0] == direction_shift))
+                                    for line in self.position.windows] + [-1])
+
+        tournament_statistics = {
+            1: 0,   # Wins of player 1
+            -1: 0,  # Wins of player -1
+            0: 0    # Draws
+        }
+
+        for lap in range(0, laps, batch_size):
+            n = min(batch_size, laps - lap)
+
+            # Line sums, heights and played columns of every game
+            line_sums = np.zeros((n, number_of_lines), dtype=np.int8)
+            heights = np.zeros((n, self.x_size), dtype=int)
+            columns = np.zeros((n, cells), dtype=np.int8)
+
+            # Number of moves and index of the winning direction (-1 for draws) of every game
+            moves = np.full(n, cells)
+            win_directions = np.full(n, -1)
+
+            running = np.arange(n)
+            player = 1
+
+            # Each game of the batch has the same number of moves made, so after a full board all are finished
+            for move in range(cells):
+                # Random move: the column with space left with the highest random number
+                scores = np.where(heights[running] < self.y_size, np.random.random((running.size, self.x_size)), -1)
+                moved_columns = scores.argmax(axis=1)
+
+                moved_bits = moved_columns * shift + heights[running, moved_columns]
+                heights[running, moved_columns] += 1
+                columns[running, move] = moved_columns
+                # Add the token to the lines through it
+                line_indices = cell_line_table[moved_bits]
+                sums = line_sums[running[:, None], line_indices] + player
+                line_sums[running[:, None], line_indices] = sums
+
+                # Win detection of the lines through the new token, lines are ordered by direction, so the first
+                # winning line has the first winning direction (like winning_move)
+                won_lines = (sums * player == self.k) & cell_line_mask[moved_bits]
+                won = won_lines.any(axis=1)
+
+                win_directions[running[won]] = line_directions[line_indices[won, won_lines[won].argmax(axis=1)]]
+                moves[running[won]] = move + 1
+
+                running = running[~won]
+                player *= -1
+
+            won = win_directions >= 0
+
+            # Player whose stats are counted: the winner or for a draw the player to move next (see play_a_game)
+            stats_players = np.where(won, np.where(moves % 2 == 1, 1, -1), np.where(moves % 2 == 0, 1, -1))
+
+            # Moves of the counted player of every game
+            move_indices = np.arange(cells)
+            player_moves = (move_indices < moves[:, None]) & ((move_indices % 2 == 0) == (stats_players == 1)[:, None])
+
+            for key, value in enumerate(np.bincount(columns[player_moves], minlength=self.x_size)):
+                self.stats['used_columns'][key] += int(value)
+
+            for index, count in enumerate(np.bincount(win_directions[won], minlength=len(directions))):
+                self.stats['win_direction'][directions[index]] += int(count)
+
+            for winner in [1, -1]:
+                wins = int(np.sum(won & (stats_players == winner)))
+                self.stats['winning_player'][winner] += wins
+                tournament_statistics[winner] += wins
+
+            self.stats['win_turn_count'].extend(np.where(stats_players == 1, (moves + 1) // 2, moves // 2).tolist())
+            self.stats['draw'] += int(np.sum(~won))
+            tournament_statistics[0] += int(np.sum(~won))
+
+            if record_moves:
+                for game in np.flatnonzero(won):
+                    self.stats['win_moves'].append(columns[game][player_moves[game]].tolist())
+
+            if print_batches:
+                print("=== Lap: {} ===\n'{}'\t{}\n'{}'\t{}\nDRAW\t{}".format(lap + n,
+                                                                             self.symbols[1],
+                                                                             tournament_statistics[1],
+                                                                             self.symbols[-1],
+                                                                             tournament_statistics[-1],
+                                                                             tournament_statistics[0]))
+
         print("Tournament results in: \n'{}'\t{}\n'{}'\t{}\nDRAW\t{}".format(self.symbols[1],
                                                                              tournament_statistics[1],
                                                                              self.symbols[-1],
@@ -517,13 +720,13 @@ class ConnectFour:
         Yys, Yxs = np.where(game_state == 1)
         Y_value = 0
 
-        # Loop over all Y-tokens and sum up the values for player Y if the value depends on at least 3 OTHER fields
+        # Loop over all Y-tokens and sum up the values for player Y if the value depends on at least k - 1 OTHER fields
         for i in range(0, Yxs.size):
-            Y_tokens = self.check_all_directions(column=Yxs[i], row=Yys[i], target_player=1)
+            Y_tokens = self.check_all_directions(column=Yxs[i], row=Yys[i], target_player=1, game_field=game_state)
             if print_direction_values:
                 print("Y_tokens ({}, {}):\n{}".format(Yxs[i], Yys[i], Y_tokens))
             for key, data in Y_tokens.items():
-                if sum(data[:2]) > 2:
+                if sum(data[:2]) > self.k - 2:
                     Y_value += data[2]
 
         if print_direction_values:
@@ -533,13 +736,13 @@ class ConnectFour:
         Rys, Rxs = np.where(game_state == -1)
         R_value = 0
 
-        # Loop over all Y-tokens and sum up the values for player Y if the value depends on at least 3 OTHER fields
+        # Loop over all Y-tokens and sum up the values for player Y if the value depends on at least k - 1 OTHER fields
         for i in range(0, Rxs.size):
-            R_tokens = self.check_all_directions(column=Rxs[i], row=Rys[i], target_player=-1)
+            R_tokens = self.check_all_directions(column=Rxs[i], row=Rys[i], target_player=-1, game_field=game_state)
             if print_direction_values:
                 print("R_tokens ({}, {}):\n{}".format(Rxs[i], Rys[i], R_tokens))
             for key, data in R_tokens.items():
-                if sum(data[:2]) > 2:
+                if sum(data[:2]) > self.k - 2:
                     R_value += data[2]
 
         if print_direction_values:
@@ -547,23 +750,48 @@ class ConnectFour:
 
         return Y_value - R_value
 
-    def move_tree_data(self, game_state, offset, player, root=None, depth=2):
+    def evaluate_position(self, position):
+        """Calculates the value of a Position with the evaluation of the game (used by the tree search).
+
+        The windows evaluation is read from the position (O(1)), every window of k cells that holds tokens
+        of only one player counts Position.weights[tokens] for that player.
+
+        :param position: Position to evaluate.
+
+        :return: Value for player Y (positive) and player R (negative).
+        """
+        if self.evaluation == "windows":
+            return position.threat_value
+
+        return self.get_state_value(game_state=position.to_array())
+
+    def move_tree_data(self, position, player, root=None, depth=2, leaves=None):
         """Builds or updates a Tree for MinMax algorithm.
 
-        :param game_state: Configuration of game field that a subtree should be created for.
-        :param offset: The field offset of the game_field (simulates gravity of Connect4 board).
+        With the windows evaluation the leaves are not valued one by one, the bitboards of all leaves of the
+        tree are collected and valued with one call of the WindowEvaluator when the tree is done.
+
+        :param position: Position (bitboards) that a subtree should be created for, it is restored when done.
         :param player: The player who moves this turn.
         :param root: The 'root' node of the subtree (a node in the tree).
         :param depth: Determines the max depth of the tree.
+        :param leaves: List of (node, bitboards) of the leaves that are not valued yet (only given by the
+                       recursive calls for the subtrees).
 
         :returns: The root node of the subtree.
         """
 
-        # Get all columns that are not full yet
-        allowed_columns = []
-        for column in range(0, self.x_size):
-            if offset[column] > -1:
-                allowed_columns.append(column)
+        if leaves is None and self.evaluation == "windows":
+            # Value all leaves of the tree at once
+            leaves = []
+            root = self.move_tree_data(position, player, root=root, depth=depth, leaves=leaves)
+
+            if leaves:
+                values = self.window_evaluator.evaluate_boards([boards for _, boards in leaves])
+                for (node, _), value in zip(leaves, values):
+                    node.value = int(value)
+
+            return root
 
         if root is None:
             # Build a new tree
@@ -572,31 +800,35 @@ class ConnectFour:
 
         if len(root.children) == 0:
             # There are no children so new moves need to be generated
-            for column in allowed_columns:
-                if self.move_allowed(column):
+            for column in range(0, self.x_size):
+                if position.move_allowed(column):
 
                     # Preset node_label as the column
                     node_label = column
 
+                    # Pretend a move
+                    position.make(column)
+
                     # Determine if the move wins the game
-                    winning_move = self.winning_move(column)
+                    winning_move = position.last_move_won()
 
-                    # Pretend a move
-                    game_state[offset[column]][column] = player
-                    offset[column] -= 1
+                    if (winning_move or depth == 0) and leaves is not None:
+                        # The leaf is valued with the other leaves when the tree is done
+                        root.add_child(label=node_label)
+                        leaves.append((root.children[-1], (position.boards[1], position.boards[-1])))
 
-                    if winning_move or depth == 0:
+                    elif winning_move or depth == 0:
                         # If the new node is a winning move just append and continue
                         root.add_child(label=node_label,
-                                       value=self.get_state_value(game_state=game_state))
+                                       value=self.evaluate_position(position))
 
                     elif depth > 0:
                         # If the new node was not a winning move go ahead and build the sub_tree
-                        sub_tree = self.move_tree_data(game_state=game_state,
-                                                       offset=offset,
+                        sub_tree = self.move_tree_data(position=position,
                                                        player=player*-1,
                                                        root=Node(label=node_label),
-                                                       depth=depth-1)
+                                                       depth=depth-1,
+                                                       leaves=leaves)
 
                         root.children.append(sub_tree)
 
@@ -605,36 +837,88 @@ class ConnectFour:
                         [winning_move: {}, depth: {}]".format(winning_move, depth))
 
                     # Revert the move
-                    offset[column] += 1
-                    game_state[offset[column]][column] = 0
+                    position.unmake()
         else:
             for i, child in enumerate(root.children):
-                root.children[i] = self.move_tree_data(game_state=game_state,
-                                                       offset=offset,
+                # The label of a child is the column of its move
+                position.make(child.label)
+                root.children[i] = self.move_tree_data(position=position,
                                                        player=player*-1,
                                                        root=child,
-                                                       depth=depth-1)
+                                                       depth=depth-1,
+                                                       leaves=leaves)
+                position.unmake()
         return root
 
-    def make_mmv_move(self, player=1, max_depth=2, print_info=False):
+    def make_mmv_move(self, player=1, max_depth=2, print_info=False, search="tree", time_budget=None):
         """Makes a move based on minmax search.
 
         :param player: The player that should make the MMV move.
         :param max_depth: Determines the maximal depth of the subtree used for MMV.
         :param print_info: Flag to print which column was picked and what value it had.
+        :param search: One of:
+                        - tree: Builds the full tree with move_tree_data and evaluates it.
+                        - alphabeta: Negamax search with alpha beta pruning, searches as many plies as the tree has.
+                        - parallel: Like alphabeta, the first two plies are split across a process pool.
+        :param time_budget: Time budget in milliseconds. If given, alphabeta is searched with iterative deepening
+                            (depth 1, 2, 3, ...) and the move of the deepest search completed in time is made,
+                            max_depth and search are ignored.
+
+        Positions of the opening book (if one is loaded) are not searched, the move of the book is made.
+        Positions with at most self.endgame_threshold empty cells are solved with the EndgameSolver, the value is
+        then 1 for a win, -1 for a loss and 0 for a draw. With a time budget the solver gets half of it, if the
+        position is not solved in time the rest of the budget is used for the iterative deepening alphabeta.
         """
         if print_info:
             print("[INFO] Starting MMV move calculations ... ")
 
-        # Tree for move prediction
-        self.game_tree = self.move_tree_data(
-            game_state=dcp(self.game_field),
-            offset=dcp(self.offset),
-            player=self.player,
-            root=None,
-            depth=max_depth)
+        book_entry = self.opening_book.lookup(self.position) if self.opening_book is not None else None
+
+        empty_cells = self.x_size * self.y_size - sum(self.position.heights)
+        endgame_result = None
+
+        if book_entry is None and self.endgame_threshold is not None and empty_cells <= self.endgame_threshold:
+            start = time.perf_counter()
+
+            try:
+                endgame_result = self.endgame_solver.solve(
+                    self.position, self.player, time_budget=time_budget / 2 if time_budget is not None else None)
+            except SearchTimeout:
+                if print_info:
+                    print("[INFO] Endgame not solved within {} ms.".format(time_budget / 2))
+
+                time_budget = max(time_budget - (time.perf_counter() - start) * 1000, 0)
+
+        if book_entry is not None:
+            search = "book"
+            value, column = book_entry
+
+        elif endgame_result is not None:
+            search = "endgame"
+            value, distance, column = endgame_result
+
+        elif time_budget is not None:
+            search = "alphabeta"
+            value, column = self.alpha_beta.iterative_deepening(self.position, self.player, time_budget)
+
+        elif search == "tree":
+            # Tree for move prediction
+            self.game_tree = self.move_tree_data(
+                position=self.position,
+                player=self.player,
+                root=None,
+                depth=max_depth)
+
+            value, column = self.game_tree.calculate_mmv(minmax=player)
 
-        value, column = self.game_tree.calculate_mmv(minmax=player)
+        elif search == "alphabeta":
+            value, column = self.alpha_beta.best_move(self.position, self.player, depth=max_depth + 1)
+
+        elif search == "parallel":
+            value, column = self.parallel_search.best_move(self.position, self.player, depth=max_depth + 1)
+
+        else:
+            raise Exception("Invalid value for search: '{}'".format(search))
 
         if print_info:
             print("[INFO] Player {}: MMV decided for column '{}' with a value of '{}'.".format(
@@ -642,16 +926,99 @@ class ConnectFour:
                 column,
                 value))
 
+            if search == "alphabeta" and time_budget is not None:
+                print("[INFO] Completed depth {} within {} ms.".format(self.alpha_beta.completed_depth, time_budget))
+
+            if search == "alphabeta":
+                print("[INFO] Searched {} positions, transposition table: {}".format(
+                    self.alpha_beta.nodes,
+                    self.transposition_table.statistics()))
+            elif search == "parallel":
+                print("[INFO] Searched {} positions in parallel.".format(self.parallel_search.nodes))
+            elif search == "book":
+                print("[INFO] Move taken from the opening book.")
+            elif search == "endgame":
+                print("[INFO] Solved {} positions: {} in {} plies.".format(
+                    self.endgame_solver.nodes,
+                    {1: "win", -1: "loss", 0: "draw"}[value],
+                    distance))
+
+        self.make_a_move(column)
+
+    def make_mcts_move(self, playouts=1000, time_budget=None, print_info=False):
+        """Makes a move based on Monte Carlo tree search.
+
+        :param playouts: Number of random playouts (used if no time budget is given).
+        :param time_budget: Time budget in milliseconds.
+        :param print_info: Flag to print which column was picked and what win rate it had.
+        """
+        if print_info:
+            print("[INFO] Starting MCTS move calculations ... ")
+
+        win_rate, column = self.mcts.best_move(self.position, playouts=playouts, time_budget=time_budget)
+
+        if print_info:
+            print("[INFO] Player {}: MCTS decided for column '{}' with a win rate of '{:.3f}'.".format(
+                self.symbols[self.player],
+                column,
+                win_rate))
+            print("[INFO] {} playouts, {} reused from earlier moves.".format(self.mcts.playouts,
+                                                                          self.mcts.reused_visits))
+
         self.make_a_move(column)
 
+    def build_opening_book(self, plies=6, depth=8, filename="opening_book", print_info=False):
+        """Builds an opening book with an alphabeta search and stores it into a .npy file.
+
+        The positions are searched with the windows evaluation, like the alphabeta search of make_mmv_move.
+
+        :param plies: Maximal number of tokens of the positions in the book.
+        :param depth: Search depth used for every position.
+        :param filename: Name of file to store the book in.
+        :param print_info: Flag to print the progress.
+        """
+        # Own search and transposition table, so the table and counters of the MMV moves are kept
+        search = AlphaBetaSearch(evaluate=lambda position: position.threat_value,
+                                 x_size=self.x_size,
+                                 transposition_table=TranspositionTable())
+
+        book = OpeningBook.build(search, plies=plies, depth=depth, x_size=self.x_size, y_size=self.y_size, k=self.k,
+                                 evaluation="windows", print_info=print_info)
+        book.save(filename)
+
+        self.load_opening_book(filename)
+
+    def load_opening_book(self, filename="opening_book"):
+        """Memory-maps an opening book of build_opening_book, it is used by make_mmv_move.
+
+        :param filename: Name of file the book was stored in.
+        """
+        book = OpeningBook.load(filename)
+
+        if (book.x_size, book.y_size, book.k) != (self.x_size, self.y_size, self.k):
+            raise Exception("The opening book '{}' is for a {}x{} board with k={}, not for {}x{} with k={}.".format(
+                filename, book.x_size, book.y_size, book.k, self.x_size, self.y_size, self.k))
+
+        if book.evaluation != "windows":
+            raise Exception("The opening book '{}' was searched with the {} evaluation, not with windows.".format(
+                filename, book.evaluation))
+
+        self.opening_book = book
+
     ######################
     # PyGame definitions #
     ######################
 
-    def startgame(self):
+    def startgame(self, move_time_budget=None):
         """Initiates all class variables needed for GUI implementation to run.
         The initiations are done here so there will be no PyGame interference while
-        using ConnectFour on console."""
+        using ConnectFour on console.
+
+        :param move_time_budget: Time budget in milliseconds for every MMV and MCTS move (None searches MMV with
+                                 depth 2 and MCTS with 1000 playouts).
+        """
+        # Time budget of MMV and MCTS moves
+        self.move_time_budget = move_time_budget
 
         # Initiate PyGame
         pygame.init()
@@ -676,17 +1043,37 @@ class ConnectFour:
             0: self.BLACK    # Empty field color
         }
 
-        # Game field definitions
-        self.SQUARESIZE = 100
+        # Game field definitions, small boards get larger squares so the menu fits into the window
+        self.SQUARESIZE = max(100, -(-400 // self.x_size), -(-500 // (self.y_size + 1)))
         self.CIRCLE_RADIUS = int(self.SQUARESIZE / 2 - 5)
 
         # PyGame basic screen setup for Connect4
-        self.WIDTH = 7 * self.SQUARESIZE
-        self.HEIGHT = (6 + 1) * self.SQUARESIZE
+        self.WIDTH = self.x_size * self.SQUARESIZE
+        self.HEIGHT = (self.y_size + 1) * self.SQUARESIZE
         self.SCREEN = pygame.display.set_mode([self.WIDTH, self.HEIGHT])
 
-        # Additional setups for PyGame
-        self.LARGE_TEXT = pygame.font.Font('freesansbold.ttf', 115)
+        # Board with empty cells, rendered once and blitted for a full redraw
+        self.BOARD_SURFACE = self._render_board()
+
+        # Game field as it is drawn on the screen and area of the token preview of player_move
+        self.drawn_field = None
+        self.hover_rect = None
+
+        # Game modes of the intro screen and their button positions (columns that fit into the window)
+        self.MENU_BUTTONS = [
+            ("E.vs.E.", 'eve'),        # Computer vs. Computer
+            ("MMV vs. E.", 'evm'),     # Computer vs. MMV-Computer
+            ("P.vs.E.", 'pve'),        # Human vs. Computer
+            ("MMV vs. P.", 'pvm'),     # Human vs. MMV-Computer
+            ("MMV vs MMV", 'mvm'),     # MMV-Computer vs. MMV-Computer
+            ("P.vs.P.", 'pvp'),        # Human vs. Human
+            ("MCTS vs. P.", 'pvc'),    # Human vs. MCTS-Computer
+            ("MMV vs MCTS", 'mvc')     # MMV-Computer vs. MCTS-Computer
+        ]
+        self.menu_positions = self._menu_layout(len(self.MENU_BUTTONS))
+
+        # Additional setups for PyGame, the large text shrinks with narrow windows
+        self.LARGE_TEXT = pygame.font.Font('freesansbold.ttf', min(115, self.WIDTH // 5))
         self.SMALL_TEXT = pygame.font.Font("freesansbold.ttf", 20)
         self.CLOCK = pygame.time.Clock()
 
@@ -721,26 +1108,12 @@ class ConnectFour:
             # Keep track of mouse action
             click = pygame.mouse.get_pressed()
 
-            # Computer vs. Computer
-            self.button((250, 200, 150, 50), self.GRAY, "E.vs.E.", mouse, click, self.start_gui_game)
-
-            # Computer vs. MMV-Computer
-            self.button((250, 275, 150, 50), self.GRAY, "MMV vs. E.", mouse, click, self.start_gui_game, ['evm'])
-
-            # Human vs. Computer
-            self.button((250, 350, 150, 50), self.GRAY, "P.vs.E.", mouse, click, self.start_gui_game, ['pve'])
-
-            # Human vs. MMV-Computer
-            self.button((250, 425, 150, 50), self.GRAY, "MMV vs. P.", mouse, click, self.start_gui_game, ['pvm'])
-
-            # MMV-Computer vs. MMV-Computer
-            self.button((250, 500, 150, 50), self.GRAY, "MMV vs MMV", mouse, click, self.start_gui_game, ['mvm'])
-
-            # Human vs. Human
-            self.button((250, 575, 150, 50), self.GRAY, "P.vs.P.", mouse, click, self.start_gui_game, ['pvp'])
+            # Game modes
+            for (x, y), (text, mode) in zip(self.menu_positions, self.MENU_BUTTONS):
+                self.button((x, y, 150, 50), self.GRAY, text, mouse, click, self.start_gui_game, [mode])
 
             # Quit
-            self.button((665, 10, 25, 25), self.RED, "X", mouse, click, self.quitgame)
+            self.button((self.WIDTH - 35, 10, 25, 25), self.RED, "X", mouse, click, self.quitgame)
 
             pygame.display.update()
             self.CLOCK.tick()
@@ -755,6 +1128,8 @@ class ConnectFour:
                         - eve: Environment vs. Environment
                         - pve: Player vs. Environment
                         - pvp: Player vs. Player
+                        - pvc: Player vs. MCTS
+                        - mvc: MMV vs. MCTS
         """
         # Stop intro screen loop if still running
         self.intro = False
@@ -765,6 +1140,8 @@ class ConnectFour:
         pvp = True if mode == 'pvp' else False
         pvm = True if mode == 'pvm' else False
         mvm = True if mode == 'mvm' else False
+        pvc = True if mode == 'pvc' else False
+        mvc = True if mode == 'mvc' else False
 
         # Game loop
         while not self.game_finished:
@@ -774,13 +1151,16 @@ class ConnectFour:
                 if event.type == pygame.QUIT:
                     self.quitgame()
 
-            if pvp or (pve and self.player == 1) or (pvm and self.player == -1):
+            if pvp or (pve and self.player == 1) or ((pvm or pvc) and self.player == -1):
                 self.player_move()
             else:
                 if pve or (evm and self.player == -1):
                     self.random_move()
-                elif pvm or evm or mvm:
-                    self.make_mmv_move(player=self.player, max_depth=2, print_info=True)
+                elif pvc or (mvc and self.player == -1):
+                    self.make_mcts_move(time_budget=self.move_time_budget, print_info=True)
+                elif pvm or evm or mvm or mvc:
+                    self.make_mmv_move(player=self.player, max_depth=2, print_info=True,
+                                       time_budget=self.move_time_budget)
 
             # Update the game field
             self.update_board()
@@ -809,29 +1189,47 @@ class ConnectFour:
             text_color = self.PLAYER_COLOR[self.player]
             text = self.symbols[self.player] + " wins!"
 
+        # The text is drawn once, only the top row (text and button) is updated in the loop
+        TextSurf, TextRect = self.text_object(text, self.LARGE_TEXT, text_color)
+        TextRect.center = ((self.WIDTH / 2), 55)
+        self.SCREEN.blit(TextSurf, TextRect)
+        top_row = pygame.Rect(0, 0, self.WIDTH, self.SQUARESIZE).union(TextRect)
+        pygame.display.update(top_row)
+
         while self.end:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     self.quitgame()
 
-            TextSurf, TextRect = self.text_object(text, self.LARGE_TEXT, text_color)
-            TextRect.center = ((self.WIDTH / 2), 55)
-            self.SCREEN.blit(TextSurf, TextRect)
-            pygame.display.update()
-
             # Keep track of the mouse
             mouse = pygame.mouse.get_pos()
 
             # Keep track of mouse action
             click = pygame.mouse.get_pressed()
 
-            self.button((590, 15, 100, 50), self.GRAY, "Back", mouse, click, self.intro_screen)
+            self.button((self.WIDTH - 110, 15, 100, 50), self.GRAY, "Back", mouse, click, self.intro_screen)
 
-            pygame.display.update()
+            pygame.display.update(top_row)
             self.CLOCK.tick()
 
+    def _menu_layout(self, count):
+        """Gives the positions of the menu buttons (150x50) below the title, column by column.
+
+        :param count: Number of buttons.
+
+        :returns: List of the (x, y) positions of the top left corners.
+        """
+        rows = max(1, (self.HEIGHT - 200) // 75)
+        columns = -(-count // rows)
+
+        # Columns are centered in the window
+        left = (self.WIDTH - (columns * 150 + (columns - 1) * 25)) // 2
+
+        return [(left + (button // rows) * 175, 200 + (button % rows) * 75) for button in range(count)]
+
     def quitgame(self):
         """Helper function for quitting game."""
+        self.close()
         pygame.quit()
         quit()
 
@@ -845,36 +1243,86 @@ class ConnectFour:
                         - pvp: Player vs. Player
                         - pvm: Player vs. MMV Algorithm
                         - mvm: MMV Algorithm vs. MMV Algorithm
+                        - pvc: Player vs. MCTS Algorithm
+                        - mvc: MMV Algorithm vs. MCTS Algorithm
 
         """
         self.reset_game()
-        self.update_board()
+        self.update_board(full=True)
         self.game_screen(mode)
 
-    def update_board(self):
-        """Draws the game board
+    def _render_board(self):
+        """Renders the game board with empty cells on a surface.
 
         This function was inspired by the Connect4 for Python tutorial by
         Keith Galli (YouTube).
         """
-        # Clear top row
-        pygame.draw.rect(self.SCREEN, self.BLACK, (0, 0, self.WIDTH, self.SQUARESIZE))
+        surface = pygame.Surface((self.WIDTH, self.HEIGHT))
+        surface.fill(self.BLACK)
 
         # Loop over columns and rows
-        for c in range(7):
-            for r in range(6):
+        for c in range(self.x_size):
+            for r in range(self.y_size):
                 # definition of a ractangle and circle for the GUI
-                rectangle = (c * self.SQUARESIZE, r * self.SQUARESIZE + self.SQUARESIZE, self.SQUARESIZE, self.SQUARESIZE)
+                rectangle = self._cell_rect(r, c)
                 circle = (int(c * self.SQUARESIZE + self.SQUARESIZE / 2), int(r * self.SQUARESIZE + self.SQUARESIZE + self.SQUARESIZE / 2))
 
-                # Draw blue rectangles (represents the game field)
-                pygame.draw.rect(self.SCREEN, self.BLUE, rectangle)
+                # Draw blue rectangles (represents the game field) with empty cells
+                pygame.draw.rect(surface, self.BLUE, rectangle)
+                pygame.draw.circle(surface, self.PLAYER_COLOR[0], circle, self.CIRCLE_RADIUS)
 
-                # Draw circles to represent cell state
-                # Check self.PLAYER_COLOR for color schema
-                pygame.draw.circle(self.SCREEN, self.PLAYER_COLOR[self.game_field[r][c]], circle, self.CIRCLE_RADIUS)
+        return surface
 
-        pygame.display.update()
+    def _cell_rect(self, row, column):
+        """Gives the screen rectangle of a cell of the game field."""
+        return pygame.Rect(column * self.SQUARESIZE, row * self.SQUARESIZE + self.SQUARESIZE, self.SQUARESIZE, self.SQUARESIZE)
+
+    def update_board(self, full=False):
+        """Draws the game board
+
+        Only the cells that changed since the last call are drawn and updated on the display.
+
+        :param full: Flag to draw the whole screen (after other screens were shown).
+        """
+        if full or self.drawn_field is None:
+            self.SCREEN.blit(self.BOARD_SURFACE, (0, 0))
+            self.drawn_field = np.zeros_like(self.game_field)
+            self.hover_rect = None
+            changed_rects = [self.SCREEN.get_rect()]
+        else:
+            changed_rects = []
+
+        # Draw circles of the changed cells, check self.PLAYER_COLOR for color schema
+        for r, c in np.argwhere(self.game_field != self.drawn_field):
+            rectangle = self._cell_rect(r, c)
+            pygame.draw.circle(self.SCREEN, self.PLAYER_COLOR[self.game_field[r][c]], rectangle.center,
+                               self.CIRCLE_RADIUS)
+            changed_rects.append(rectangle)
+
+        self.drawn_field = np.copy(self.game_field)
+
+        if changed_rects:
+            pygame.display.update(changed_rects)
+
+    def _draw_hover(self, x_position=None):
+        """Moves the token preview of player_move in the top row.
+
+        :param x_position: X position of the preview (None removes it).
+        """
+        changed_rects = []
+
+        if self.hover_rect is not None:
+            pygame.draw.rect(self.SCREEN, self.BLACK, self.hover_rect)
+            changed_rects.append(self.hover_rect)
+            self.hover_rect = None
+
+        if x_position is not None:
+            self.hover_rect = pygame.Rect(x_position - self.SQUARESIZE // 2, 0, self.SQUARESIZE, self.SQUARESIZE)
+            pygame.draw.circle(self.SCREEN, self.PLAYER_COLOR[self.player], self.hover_rect.center,
+                               self.CIRCLE_RADIUS)
+            changed_rects.append(self.hover_rect)
+
+        pygame.display.update(changed_rects)
 
     def text_object(self, text, font, color):
         """Creates a text object for PyGame.
@@ -929,36 +1377,21 @@ class ConnectFour:
 
                 # Player moves the mouse (token placement preview)
                 if event.type == pygame.MOUSEMOTION:
-                    # Clear top row
-                    pygame.draw.rect(self.SCREEN, self.BLACK, (0, 0, self.WIDTH, self.SQUARESIZE))
-
-                    # X position of mouse
-                    x_position = event.pos[0]
-
-                    # Draw the right token color for the player on mouse position
-                    pygame.draw.circle(
-                        self.SCREEN,
-                        self.PLAYER_COLOR[self.player],
-                        (x_position, int(self.SQUARESIZE/2)),
-                        self.CIRCLE_RADIUS
-                    )
-                    # Update view
-                    pygame.display.update()
+                    # Draw the right token color for the player on mouse position, only the old and the new preview
+                    # area are updated
+                    self._draw_hover(event.pos[0])
 
                 # Player presses the mouse button (puts a token)
                 if event.type == pygame.MOUSEBUTTONDOWN:
                     # X position of mouse
                     x_position = event.pos[0]
 
-                    # Rounded column number (0, 1, ..., 6)
+                    # Rounded column number (0, 1, ..., x_size - 1)
                     column = int(math.floor(x_position / self.SQUARESIZE))
                     valid_move = self.make_a_move(column)
 
-                    # Clear top row
-                    pygame.draw.rect(self.SCREEN, self.BLACK, (0, 0, self.WIDTH, self.SQUARESIZE))
-
-                    # Update view
-                    pygame.display.update()
+                    # Remove the preview
+                    self._draw_hover()
 
 
 if __name__ == '__main__':
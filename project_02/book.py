@@ -0,0 +1,167 @@
+import json
+
+import numpy as np
+
+from project_02.position import Position
+
+
+# Entry of an opening book: key of the position (Position.key), value for the player to move and best move
+BOOK_DTYPE = np.dtype([('key', np.uint64), ('value', np.int64), ('move', np.int8)])
+
+
+class OpeningBook:
+    def __init__(self, entries, x_size=7, y_size=6, k=4, evaluation="windows"):
+        """Evaluated positions of the first plies of a game, sorted by key.
+
+        Keys are the ones of Position.key, so a position and its mirror image share an entry. Moves are stored
+        for the position the key belongs to and are mirrored on lookup. The keys do not depend on k, so a book
+        may only be used for games of its board size and k.
+
+        :param entries: Array of BOOK_DTYPE sorted by key (may be memory-mapped).
+        :param x_size: Number of columns of the positions in the book.
+        :param y_size: Number of rows of the positions in the book.
+        :param k: Number of tokens in a line that win the games of the book.
+        :param evaluation: Name of the evaluation the values of the book were searched with.
+        """
+        self.entries = entries
+        self.x_size = x_size
+        self.y_size = y_size
+        self.k = k
+        self.evaluation = evaluation
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def build(cls, search, plies=6, depth=8, x_size=7, y_size=6, k=4, evaluation="windows", print_info=False):
+        """Evaluates every position that can be reached within a number of plies.
+
+        :param search: AlphaBetaSearch used to evaluate the positions.
+        :param plies: Maximal number of tokens of the positions in the book.
+        :param depth: Search depth used for every position.
+        :param x_size: Number of columns.
+        :param y_size: Number of rows.
+        :param k: Number of tokens in a line that win the game.
+        :param evaluation: Name of the evaluation of the search, it is stored with the book.
+        :param print_info: Flag to print the progress.
+
+        :returns: OpeningBook of all positions with at most plies tokens that are not finished.
+        """
+        # Encodings of all distinct positions, player 1 makes the first move
+        encodings = {}
+        position = Position(x_size, y_size, k)
+        cls._collect_positions(position, 1, plies, encodings)
+
+        if print_info:
+            print("[INFO] Evaluating {} positions with depth {} ...".format(len(encodings), depth))
+
+        entries = np.zeros(len(encodings), dtype=BOOK_DTYPE)
+
+        for i, (key, encoding) in enumerate(sorted(encodings.items())):
+            position = Position.decode(encoding)
+            player = position.player_to_move()
+
+            # Entries of deeper searches of other positions would change the value
+            if search.transposition_table is not None:
+                search.transposition_table.clear()
+
+            value, column = search.best_move(position, player, depth)
+
+            # The position was decoded from the encoding the key belongs to
+            entries[i] = (key, value, column)
+
+            if print_info and not (i + 1) % 1000:
+                print("[INFO] {} / {} positions evaluated".format(i + 1, len(encodings)))
+
+        return cls(entries, x_size, y_size, k, evaluation)
+
+    @classmethod
+    def _collect_positions(cls, position, player, plies, encodings):
+        """Adds the encodings of a position and all its successors to encodings (by key).
+
+        :param position: Position that is not finished.
+        :param player: The player who moves this turn.
+        :param plies: Number of plies that may still be played.
+        :param encodings: Dict that maps keys to encodings of the position the key belongs to.
+        """
+        key, mirrored = position.key()
+
+        if key in encodings:
+            return
+
+        # Store the orientation the key belongs to
+        if mirrored:
+            encodings[key] = cls._mirrored_encoding(position)
+        else:
+            encodings[key] = position.encode()
+
+        if plies == 0:
+            return
+
+        for column in range(position.x_size):
+            if not position.move_allowed(column):
+                continue
+
+            position.play(column, player)
+
+            if not position.is_winning(player) and not position.is_full():
+                cls._collect_positions(position, -player, plies - 1, encodings)
+
+            position.undo(column, player)
+
+    @staticmethod
+    def _mirrored_encoding(position):
+        """Gives the encoding (Position.encode) of the left-right mirror image of a position."""
+        shift = position.y_size + 1
+        boards = {}
+
+        for player, board in position.boards.items():
+            boards[player] = 0
+            for column in range(position.x_size):
+                column_bits = (board >> (column * shift)) & ((1 << shift) - 1)
+                boards[player] |= column_bits << ((position.x_size - 1 - column) * shift)
+
+        return position.x_size, position.y_size, position.k, boards[1], boards[-1]
+
+    def lookup(self, position):
+        """Looks up a position with a binary search over the keys.
+
+        :param position: Position to look up.
+
+        :returns: Tuple of (value for the player to move, column) or None if the position is not in the book.
+        """
+        key, mirrored = position.key()
+        keys = self.entries['key']
+
+        index = np.searchsorted(keys, np.uint64(key))
+        if index == len(keys) or keys[index] != key:
+            return None
+
+        column = int(self.entries['move'][index])
+        if mirrored:
+            column = self.x_size - 1 - column
+
+        return int(self.entries['value'][index]), column
+
+    def save(self, filename="opening_book"):
+        """Stores the book into a .npy file and its board size, k and evaluation into a .json file.
+
+        :param filename: Name of file to store the book in.
+        """
+        np.save(filename+'.npy', self.entries)
+
+        with open(filename+'.json', 'w') as outfile:
+            json.dump({'x_size': self.x_size, 'y_size': self.y_size, 'k': self.k, 'evaluation': self.evaluation},
+                      outfile)
+
+    @classmethod
+    def load(cls, filename="opening_book"):
+        """Memory-maps a book of save from a .npy file.
+
+        :param filename: Name of file the book was stored in.
+        """
+        with open(filename+'.json') as infile:
+            config = json.load(infile)
+
+        return cls(np.load(filename+'.npy', mmap_mode='r'), config['x_size'], config['y_size'], config['k'],
+                   config['evaluation'])
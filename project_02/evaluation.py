@@ -0,0 +1,83 @@
+import numpy as np
+
+from project_02.position import threat_weights, threat_windows
+
+
+class WindowEvaluator:
+    def __init__(self, x_size=7, y_size=6, k=4, weights=None):
+        """Evaluates many positions at once with the windows of k cells in a line.
+
+        Every window that holds n tokens of one player and none of the other counts weights[n] for that
+        player, which is the same value Position.threat_value keeps for a single position.
+
+        :param x_size: Number of columns.
+        :param y_size: Number of rows.
+        :param k: Number of cells of a window.
+        :param weights: Value of a window with 0 ... k tokens of one player (defaults to threat_weights(k)).
+        """
+        self.x_size = x_size
+        self.y_size = y_size
+        self.k = k
+        self.weights = np.array(weights if weights is not None else threat_weights(k), dtype=np.int64)
+
+        windows, _ = threat_windows(x_size, y_size, k)
+
+        # Window index arrays (windows x k) into the bits of a Position and into a flat game field (row 0 on top)
+        self.bit_windows = np.array(windows, dtype=np.int64)
+        columns, heights = np.divmod(self.bit_windows, y_size + 1)
+        self.field_windows = (y_size - 1 - heights) * x_size + columns
+
+        # Number of bytes of a bitboard
+        self.board_bytes = (x_size * (y_size + 1) + 7) // 8
+
+    def threat_counts(self, fields):
+        """Counts the open windows of both players by the number of tokens in them.
+
+        :param fields: Stack of game fields (N, y_size, x_size) with 1, -1 and 0.
+
+        :returns: Dict that maps every player to an array (N, k + 1) of window counts, [:, 2] are the open twos.
+        """
+        cells = np.asarray(fields).reshape(len(fields), -1)[:, self.field_windows]
+        return self._threat_counts(cells == 1, cells == -1)
+
+    def evaluate_fields(self, fields):
+        """Values of a stack of game fields for player 1.
+
+        :param fields: Stack of game fields (N, y_size, x_size) with 1, -1 and 0.
+
+        :returns: Array of N values.
+        """
+        counts = self.threat_counts(fields)
+        return counts[1] @ self.weights - counts[-1] @ self.weights
+
+    def evaluate_boards(self, boards):
+        """Values of a stack of Position bitboards for player 1.
+
+        :param boards: Sequence of N pairs of the bitboards (ints of any size) of player 1 and player -1.
+
+        :returns: Array of N values.
+        """
+        data = b''.join(board.to_bytes(self.board_bytes, 'little') for pair in boards for board in pair)
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8).reshape(len(boards), 2, self.board_bytes),
+                             axis=2, bitorder='little')
+        cells = bits[:, :, self.bit_windows].astype(bool)
+
+        counts = self._threat_counts(cells[:, 0], cells[:, 1])
+        return counts[1] @ self.weights - counts[-1] @ self.weights
+
+    def _threat_counts(self, player_cells, opponent_cells):
+        """Counts open windows from boolean cell arrays (N, windows, k) of player 1 and player -1."""
+        tokens = {1: player_cells.sum(axis=2), -1: opponent_cells.sum(axis=2)}
+        counts = {}
+
+        # Offsets that give every position its own k + 1 bins in a single bincount
+        n = len(player_cells)
+        offsets = np.arange(n)[:, None] * (self.k + 1)
+
+        for player in (1, -1):
+            # Windows with tokens of the other player are not open, they are counted as empty and dropped
+            open_tokens = np.where(tokens[-player] == 0, tokens[player], 0)
+            counts[player] = np.bincount((open_tokens + offsets).ravel(), minlength=n * (self.k + 1)).reshape(n, -1)
+            counts[player][:, 0] = 0
+
+        return counts
@@ -0,0 +1,201 @@
+import math
+import random
+import time
+
+
+class MCTSNode:
+    # Nodes are created for every expansion, slots keep them small
+    __slots__ = ('parent', 'move', 'player', 'children', 'untried', 'visits', 'wins', 'winner')
+
+    def __init__(self, parent=None, move=None, player=None, untried=None, winner=None):
+        """Node of a Monte Carlo search tree.
+
+        :param parent: Parent node (None for the root).
+        :param move: Column of the move that leads to this node.
+        :param player: Player who made the move that leads to this node.
+        :param untried: Columns that have no child yet.
+        :param winner: Result of a finished game (1, -1 or 0 for a draw), None if the game is not finished.
+        """
+        self.parent = parent
+        self.move = move
+        self.player = player
+        self.children = {}
+        self.untried = untried if untried is not None else []
+        self.visits = 0
+
+        # Sum of the results for player (1 for a win, 0.5 for a draw)
+        self.wins = 0.0
+        self.winner = winner
+
+
+class MonteCarloTreeSearch:
+    def __init__(self, exploration=math.sqrt(2), seed=None):
+        """Monte Carlo tree search with UCT selection and random playouts on a Position.
+
+        The tree of the last search is kept. If the position of the next search follows from its root, the
+        subtree of that position (and its statistics) is reused.
+
+        :param exploration: Exploration constant of UCT.
+        :param seed: Seed for the random playouts (optional).
+        """
+        self.exploration = exploration
+        self.rng = random.Random(seed)
+
+        # Root of the tree and the moves (Position.moves) that lead to it
+        self.root = None
+        self.root_moves = []
+
+        # Number of playouts of the last search and visits of the root that were reused from earlier searches
+        self.playouts = 0
+        self.reused_visits = 0
+
+        # Column heights of the random games
+        self._heights = []
+
+    def best_move(self, position, playouts=1000, time_budget=None):
+        """Searches the best move for the player to move.
+
+        :param position: Position to search (its move stack is used for tree reuse, it is restored when done).
+        :param playouts: Number of playouts (used if no time budget is given).
+        :param time_budget: Time budget in milliseconds.
+
+        :returns: Tuple of (win rate for the player to move, column).
+        """
+        root = self._reuse_root(position)
+        self.reused_visits = root.visits
+        self.playouts = 0
+
+        deadline = time.perf_counter() + time_budget / 1000.0 if time_budget is not None else None
+
+        while True:
+            if deadline is not None:
+                # At least one playout, so the root has a child
+                if self.playouts > 0 and time.perf_counter() > deadline:
+                    break
+            elif self.playouts >= playouts:
+                break
+
+            self._playout(position, root)
+            self.playouts += 1
+
+        best = max(root.children.values(), key=lambda child: child.visits)
+        return best.wins / best.visits, best.move
+
+    def _reuse_root(self, position):
+        """Gives the node of a position in the kept tree or a new root."""
+        moves = position.moves
+        node = self.root
+
+        if node is not None and moves[:len(self.root_moves)] == self.root_moves:
+            for column in moves[len(self.root_moves):]:
+                node = node.children.get(column)
+                if node is None:
+                    break
+        else:
+            node = None
+
+        if node is None:
+            node = MCTSNode(player=-position.player_to_move(), untried=self._moves(position))
+
+        node.parent = None
+        self.root = node
+        self.root_moves = list(moves)
+
+        return node
+
+    def _moves(self, position):
+        """Gives the allowed columns of a position in random order."""
+        moves = [column for column in range(position.x_size) if position.move_allowed(column)]
+        self.rng.shuffle(moves)
+        return moves
+
+    def _playout(self, position, node):
+        """Runs one selection, expansion, random playout and backpropagation from a node.
+
+        :param position: Position of the node, it is restored when done.
+        :param node: Node to start from.
+        """
+        made = 0
+
+        # Selection: follow the best UCT children of fully expanded nodes
+        while not node.untried and node.children and node.winner is None:
+            log_visits = math.log(node.visits)
+            node = max(node.children.values(),
+                       key=lambda child: child.wins / child.visits
+                       + self.exploration * math.sqrt(log_visits / child.visits))
+            position.make(node.move)
+            made += 1
+
+        # Expansion: add one untried move
+        if node.untried and node.winner is None:
+            column = node.untried.pop()
+            player = position.player_to_move()
+            position.make(column)
+            made += 1
+
+            if position.is_winning(player):
+                child = MCTSNode(node, column, player, untried=[], winner=player)
+            elif position.is_full():
+                child = MCTSNode(node, column, player, untried=[], winner=0)
+            else:
+                child = MCTSNode(node, column, player, untried=self._moves(position))
+
+            node.children[column] = child
+            node = child
+
+        winner = node.winner if node.winner is not None else self._random_game(position)
+
+        # Backpropagation
+        while node is not None:
+            node.visits += 1
+            if winner == node.player:
+                node.wins += 1
+            elif winner == 0:
+                node.wins += 0.5
+            node = node.parent
+
+        for _ in range(made):
+            position.unmake()
+
+    def _random_game(self, position):
+        """Plays random moves until the game is finished.
+
+        The moves are made on copies of the bitboards (ints) and on a heights buffer of the search, so the
+        position is not changed and no objects are created for the moves.
+
+        :param position: Position of a game that is not finished.
+
+        :returns: The winner (1, -1 or 0 for a draw).
+        """
+        x_size = position.x_size
+        y_size = position.y_size
+        column_bits = y_size + 1
+        shifts = position.shifts.values()
+        lines = position.lines
+
+        if len(self._heights) != x_size:
+            self._heights = [0] * x_size
+        heights = self._heights
+        heights[:] = position.heights
+
+        player = position.player_to_move()
+        boards = {1: position.boards[1], -1: position.boards[-1]}
+        randrange = self.rng.randrange
+
+        for _ in range(x_size * y_size - sum(heights)):
+            # Random columns until one has space left (at least one has, the game is not finished)
+            column = randrange(x_size)
+            while heights[column] == y_size:
+                column = randrange(x_size)
+
+            board = boards[player] | 1 << (column * column_bits + heights[column])
+            boards[player] = board
+            heights[column] += 1
+
+            for shift in shifts:
+                if lines(board, shift):
+                    return player
+
+            player = -player
+
+        return 0
@@ -0,0 +1,296 @@
+import numpy as np
+
+
+# Zobrist keys of every board size, see zobrist_keys
+_ZOBRIST_KEYS = {}
+
+
+def zobrist_keys(x_size, y_size):
+    """Gives random 64 bit keys for every player and cell of a board size (the same on every call).
+
+    :param x_size: Number of columns.
+    :param y_size: Number of rows.
+
+    :returns: Dict that maps every player to a list of keys, indexed like the bits of a Position.
+    """
+    if (x_size, y_size) not in _ZOBRIST_KEYS:
+        rng = np.random.default_rng(seed=x_size * 1000 + y_size)
+        keys = rng.integers(0, 2**64, size=(2, x_size * (y_size + 1)), dtype=np.uint64).tolist()
+        _ZOBRIST_KEYS[(x_size, y_size)] = {1: keys[0], -1: keys[1]}
+
+    return _ZOBRIST_KEYS[(x_size, y_size)]
+
+
+# Windows of every board size and line length, see threat_windows
+_THREAT_WINDOWS = {}
+
+
+def threat_weights(k=4):
+    """Gives the value of a window that holds 0, 1, ..., k tokens of one player and none of the other.
+
+    :param k: Number of cells of a window.
+    """
+    return (0,) + tuple(10**(tokens - 1) for tokens in range(1, k + 1))
+
+
+def threat_windows(x_size, y_size, k=4):
+    """Gives all windows (lines) of k cells (the same on every call).
+
+    :param x_size: Number of columns.
+    :param y_size: Number of rows.
+    :param k: Number of cells of a window.
+
+    :returns: Tuple of (list of windows as lists of bits, list of the window indexes of every bit).
+    """
+    if (x_size, y_size, k) not in _THREAT_WINDOWS:
+        windows = []
+
+        # Start cell (column, height) ranges and steps for horizontal, vertical, diagonal and inverse diagonal
+        for columns, heights, step in ((range(x_size - k + 1), range(y_size), (1, 0)),
+                                       (range(x_size), range(y_size - k + 1), (0, 1)),
+                                       (range(x_size - k + 1), range(y_size - k + 1), (1, 1)),
+                                       (range(x_size - k + 1), range(k - 1, y_size), (1, -1))):
+            for column in columns:
+                for height in heights:
+                    windows.append([(column + i*step[0]) * (y_size + 1) + height + i*step[1] for i in range(k)])
+
+        cell_windows = [[] for _ in range(x_size * (y_size + 1))]
+        for index, window in enumerate(windows):
+            for bit in window:
+                cell_windows[bit].append(index)
+
+        _THREAT_WINDOWS[(x_size, y_size, k)] = windows, cell_windows
+
+    return _THREAT_WINDOWS[(x_size, y_size, k)]
+
+
+class Position:
+    def __init__(self, x_size=7, y_size=6, k=4):
+        """Connect-k position stored as bitboards.
+
+        Every player has an integer whose bits are the cells occupied by the player. The bits are ordered
+        column by column from the bottom up, every column has one additional (always empty) bit on top, so
+        lines can not wrap around into the next column. The number of tokens of every column is kept in heights.
+
+        :param x_size: Number of columns.
+        :param y_size: Number of rows.
+        :param k: Number of tokens in a line that win the game.
+        """
+        self.x_size = x_size
+        self.y_size = y_size
+        self.k = k
+
+        self.boards = {1: 0, -1: 0}
+        self.heights = [0] * x_size
+
+        # Columns of the moves made with make (play and undo do not change it)
+        self.moves = []
+
+        # Zobrist hashes of the position and of its left-right mirror image, updated with every move
+        self.zobrist = zobrist_keys(x_size, y_size)
+        self.hash = 0
+        self.mirror_hash = 0
+
+        # Number of tokens of every player in every window of k cells and the resulting value for player 1,
+        # only the windows through the cell of a move are updated
+        self.windows, self.cell_windows = threat_windows(x_size, y_size, k)
+        self.weights = threat_weights(k)
+        self.window_counts = {1: [0] * len(self.windows), -1: [0] * len(self.windows)}
+        self.threat_value = 0
+
+        # Bit shift to the next cell of a line for every direction
+        self.shifts = {
+            'h': y_size + 1,    # horizontal
+            'v': 1,             # vertical
+            'd': y_size + 2,    # diagonal (bottom left to top right)
+            'i': y_size         # inverse diagonal (top left to bottom right)
+        }
+
+    def move_allowed(self, column):
+        """Checks if a token can be put into a column.
+
+        :param column: Column to put the token.
+        """
+        return 0 <= column < self.x_size and self.heights[column] < self.y_size
+
+    def play(self, column, player):
+        """Puts a token into a column.
+
+        :param column: Column to put the token.
+        :param player: Player the token belongs to.
+        """
+        bit = column * (self.y_size + 1) + self.heights[column]
+        mirror_bit = (self.x_size - 1 - column) * (self.y_size + 1) + self.heights[column]
+
+        self.boards[player] |= 1 << bit
+        self.heights[column] += 1
+
+        self.hash ^= self.zobrist[player][bit]
+        self.mirror_hash ^= self.zobrist[player][mirror_bit]
+
+        counts = self.window_counts[player]
+        other_counts = self.window_counts[-player]
+
+        for window in self.cell_windows[bit]:
+            if other_counts[window] == 0:
+                # The window is still open for the player
+                self.threat_value += player * (self.weights[counts[window] + 1] - self.weights[counts[window]])
+            elif counts[window] == 0:
+                # The window is closed for the opponent now
+                self.threat_value += player * self.weights[other_counts[window]]
+            counts[window] += 1
+
+    def player_to_move(self):
+        """Gives the player who moves next (player 1 makes the first move)."""
+        return 1 if sum(self.heights) % 2 == 0 else -1
+
+    def make(self, column):
+        """Puts a token of the player to move into a column and pushes the move onto the move stack.
+
+        :param column: Column to put the token.
+        """
+        self.play(column, self.player_to_move())
+        self.moves.append(column)
+
+    def unmake(self):
+        """Takes back the last move of the move stack.
+
+        :returns: Column of the move.
+        """
+        column = self.moves.pop()
+        self.undo(column, -self.player_to_move())
+        return column
+
+    def last_move_won(self):
+        """Checks if the last move of the move stack completed a line, only the windows through its cell are read."""
+        column = self.moves[-1]
+        bit = column * (self.y_size + 1) + self.heights[column] - 1
+        counts = self.window_counts[-self.player_to_move()]
+
+        for window in self.cell_windows[bit]:
+            if counts[window] == self.k:
+                return True
+
+        return False
+
+    def undo(self, column, player):
+        """Removes the top token of a column.
+
+        :param column: Column to remove the token from.
+        :param player: Player the token belongs to.
+        """
+        self.heights[column] -= 1
+
+        bit = column * (self.y_size + 1) + self.heights[column]
+        mirror_bit = (self.x_size - 1 - column) * (self.y_size + 1) + self.heights[column]
+
+        self.boards[player] &= ~(1 << bit)
+
+        self.hash ^= self.zobrist[player][bit]
+        self.mirror_hash ^= self.zobrist[player][mirror_bit]
+
+        counts = self.window_counts[player]
+        other_counts = self.window_counts[-player]
+
+        for window in self.cell_windows[bit]:
+            counts[window] -= 1
+            if other_counts[window] == 0:
+                self.threat_value -= player * (self.weights[counts[window] + 1] - self.weights[counts[window]])
+            elif counts[window] == 0:
+                self.threat_value -= player * self.weights[other_counts[window]]
+
+    def key(self):
+        """Gives a hash that is the same for the position and its mirror image.
+
+        :returns: Tuple of (key, flag if the key is the one of the mirror image).
+        """
+        if self.mirror_hash < self.hash:
+            return self.mirror_hash, True
+        return self.hash, False
+
+    def lines(self, board, shift):
+        """Gives the first bits of all lines of k tokens of a board in one direction.
+
+        Runs of tokens are doubled in length (1, 2, 4, ...) by shift and AND, the last step adds the missing length.
+
+        :param board: Bitboard of a player.
+        :param shift: Bit shift to the next cell of a line (see self.shifts).
+        """
+        runs = board
+        length = 1
+
+        while 2 * length <= self.k:
+            runs &= runs >> (length * shift)
+            length *= 2
+
+        if length < self.k:
+            runs &= runs >> ((self.k - length) * shift)
+
+        return runs
+
+    def winning_directions(self, player):
+        """Gives all directions in which a player has k tokens in a line.
+
+        :param player: Player to check.
+
+        :returns: List of directions ('h', 'v', 'd', 'i').
+        """
+        board = self.boards[player]
+        return [direction for direction, shift in self.shifts.items() if self.lines(board, shift)]
+
+    def is_winning(self, player):
+        """Checks if a player has k tokens in a line.
+
+        :param player: Player to check.
+        """
+        board = self.boards[player]
+
+        for shift in self.shifts.values():
+            if self.lines(board, shift):
+                return True
+
+        return False
+
+    def is_full(self):
+        """Checks if all cells are occupied."""
+        return sum(self.heights) == self.x_size * self.y_size
+
+    def encode(self):
+        """Gives a compact encoding of the position that is cheap to send to other processes.
+
+        :returns: Tuple of (x_size, y_size, k, bitboard of player 1, bitboard of player -1).
+        """
+        return self.x_size, self.y_size, self.k, self.boards[1], self.boards[-1]
+
+    @staticmethod
+    def decode(encoding):
+        """Creates a Position from an encoding of Position.encode.
+
+        :param encoding: Tuple of (x_size, y_size, k, bitboard of player 1, bitboard of player -1).
+        """
+        x_size, y_size, k, board, other_board = encoding
+        position = Position(x_size, y_size, k)
+
+        for column in range(x_size):
+            for height in range(y_size):
+                bit = 1 << (column * (y_size + 1) + height)
+                if board & bit:
+                    position.play(column, 1)
+                elif other_board & bit:
+                    position.play(column, -1)
+                else:
+                    break
+
+        return position
+
+    def to_array(self):
+        """Converts the position into the game_field representation of ConnectFour (row 0 is the top row)."""
+        field = np.zeros((self.y_size, self.x_size), dtype=int)
+
+        for player, board in self.boards.items():
+            for column in range(self.x_size):
+                for height in range(self.heights[column]):
+                    if board >> (column * (self.y_size + 1) + height) & 1:
+                        field[self.y_size - 1 - height][column] = player
+
+        return field
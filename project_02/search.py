@@ -0,0 +1,691 @@
+import multiprocessing
+import time
+
+import numpy as np
+
+from project_02.position import Position
+
+
+# Value of a won game, wins in fewer moves get higher values
+WIN_VALUE = 10**9
+
+# Values above this bound are wins (or losses if negative) that depend on the number of plies to the end
+WIN_BOUND = WIN_VALUE - 1000
+
+# Bound types of values stored in a TranspositionTable
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+
+class SearchTimeout(Exception):
+    """Raised inside a search when its deadline has passed."""
+    pass
+
+
+class TranspositionTable:
+    def __init__(self, memory=16 * 2**20):
+        """Hash table of searched positions with a fixed memory budget.
+
+        Every entry holds a key (Zobrist hash), a value, the depth it was searched to, the bound type of the
+        value and the best move. The slot of a key is fixed, if it is occupied by another key the entry with
+        the lower search depth is replaced.
+
+        :param memory: Memory budget in bytes.
+        """
+        # Number of slots is the largest power of two that fits into the memory budget
+        entry_size = 8 + 8 + 1 + 1 + 1
+        self.size = 2 ** int(np.log2(max(memory // entry_size, 1)))
+        self.mask = self.size - 1
+
+        self.keys = np.zeros(self.size, dtype=np.uint64)
+        self.values = np.zeros(self.size, dtype=np.int64)
+        self.depths = np.full(self.size, -1, dtype=np.int8)
+        self.bounds = np.zeros(self.size, dtype=np.int8)
+        self.moves = np.zeros(self.size, dtype=np.int8)
+
+        # Counters for lookups, found entries, slots occupied by other keys and stored entries
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def probe(self, key):
+        """Looks up the entry of a key.
+
+        :param key: Zobrist hash of the position.
+
+        :returns: Tuple of (value, depth, bound, move) or None if there is no entry for the key.
+        """
+        self.probes += 1
+        index = key & self.mask
+
+        if self.depths[index] < 0:
+            return None
+
+        if self.keys[index] != key:
+            self.collisions += 1
+            return None
+
+        self.hits += 1
+        return int(self.values[index]), int(self.depths[index]), int(self.bounds[index]), int(self.moves[index])
+
+    def store(self, key, value, depth, bound, move):
+        """Stores an entry if its slot is empty, holds the same key or a shallower search.
+
+        :param key: Zobrist hash of the position.
+        :param value: Value of the position.
+        :param depth: Depth the position was searched to.
+        :param bound: One of EXACT, LOWER_BOUND or UPPER_BOUND.
+        :param move: Best move of the position.
+        """
+        index = key & self.mask
+
+        if self.depths[index] <= depth or self.keys[index] == key:
+            self.keys[index] = key
+            self.values[index] = value
+            self.depths[index] = depth
+            self.bounds[index] = bound
+            self.moves[index] = move
+            self.stores += 1
+
+    def clear(self):
+        """Removes all entries and resets the counters."""
+        self.depths[:] = -1
+        self.probes = self.hits = self.collisions = self.stores = 0
+
+    def statistics(self):
+        """Gives the counters of the table as dict."""
+        return {
+            'probes': self.probes,
+            'hits': self.hits,
+            'collisions': self.collisions,
+            'stores': self.stores
+        }
+
+
+class AlphaBetaSearch:
+    def __init__(self, evaluate, x_size=7, transposition_table=None):
+        """Negamax search with alpha beta pruning on a Position, no tree is built.
+
+        :param evaluate: Function that takes a Position and returns its value for player 1
+                         (positive values are good for player 1, negative ones for player -1).
+        :param x_size: Number of columns of the positions to search.
+        :param transposition_table: TranspositionTable to remember searched positions in (optional).
+        """
+        self.evaluate = evaluate
+        self.x_size = x_size
+        self.transposition_table = transposition_table
+
+        # Columns ordered from the center to the edges, central moves are most likely to be good
+        self.move_order = sorted(range(x_size), key=lambda column: abs(2*column - (x_size - 1)))
+
+        # Number of positions visited by the last search
+        self.nodes = 0
+
+        # Deadline (time.perf_counter) of a time bounded search, None if the search is not time bounded
+        self.deadline = None
+
+        # Principal variation (best line of moves) of every ply of the running search and of the last search
+        self.pv_lines = {}
+        self.principal_variation = []
+        self._follow_pv = False
+
+        # Depth of the last completed iteration of iterative_deepening
+        self.completed_depth = 0
+
+    def best_move(self, position, player, depth):
+        """Searches the best move for a player.
+
+        :param position: Position to search (it is restored when the search is done).
+        :param player: The player who moves this turn.
+        :param depth: Number of plies to look ahead.
+
+        :returns: Tuple of (value for player, column).
+        """
+        self.nodes = 0
+        self.principal_variation = []
+        return self._search_root(position, player, depth)
+
+    def iterative_deepening(self, position, player, time_budget, max_depth=None):
+        """Searches with depth 1, 2, 3, ... until the time budget is used up.
+
+        Every iteration tries the principal variation of the previous one first. The move of the deepest
+        completed iteration is returned, depth 1 is always completed.
+
+        :param position: Position to search (it is restored when the search is done).
+        :param player: The player who moves this turn.
+        :param time_budget: Time budget in milliseconds.
+        :param max_depth: Maximal depth to search (defaults to the number of empty cells).
+
+        :returns: Tuple of (value for player, column).
+        """
+        deadline = time.perf_counter() + time_budget / 1000.0
+        max_depth = max_depth if max_depth is not None else position.x_size * position.y_size - sum(position.heights)
+
+        self.nodes = 0
+        self.principal_variation = []
+        self.completed_depth = 0
+        result = None
+
+        try:
+            for depth in range(1, max_depth + 1):
+                try:
+                    result = self._search_root(position, player, depth)
+                except SearchTimeout:
+                    break
+
+                self.completed_depth = depth
+
+                if abs(result[0]) > WIN_BOUND or time.perf_counter() > deadline:
+                    # Proven result or no time for another iteration
+                    break
+
+                # Only the first iteration runs without deadline
+                self.deadline = deadline
+        finally:
+            self.deadline = None
+
+        return result
+
+    def _search_root(self, position, player, depth):
+        """Runs negamax on the root position and keeps its principal variation.
+
+        :param position: Position to search.
+        :param player: The player who moves this turn.
+        :param depth: Number of plies to look ahead.
+        """
+        self.pv_lines = {}
+        self._follow_pv = len(self.principal_variation) > 0
+
+        result = self.negamax(position, player, depth, -WIN_VALUE - 1, WIN_VALUE + 1, 0)
+
+        self.principal_variation = self.pv_lines.get(0, [result[1]])
+        return result
+
+    def negamax(self, position, player, depth, alpha, beta, ply):
+        """Value of a position for the player to move, searched to a fixed depth.
+
+        :param position: Position to search.
+        :param player: The player who moves this turn.
+        :param depth: Number of plies to look ahead (at least 1).
+        :param alpha: Value the player is already guaranteed.
+        :param beta: Value the opponent is already guaranteed (negated).
+        :param ply: Number of plies from the root of the search.
+
+        :returns: Tuple of (value for player, best column).
+        """
+        self.nodes += 1
+
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        self.pv_lines[ply] = []
+
+        best_value = None
+        best_column = None
+
+        original_alpha = alpha
+        table_move = None
+
+        if self.transposition_table is not None:
+            key, mirrored = position.key()
+            entry = self.transposition_table.probe(key)
+
+            if entry is not None:
+                value, entry_depth, bound, table_move = entry
+                value = self._from_table_value(value, ply)
+
+                # Moves are stored for the position the key belongs to
+                if mirrored:
+                    table_move = self.x_size - 1 - table_move
+
+                if entry_depth >= depth and not self._follow_pv:
+                    if bound == EXACT:
+                        self.pv_lines[ply] = [table_move]
+                        return value, table_move
+                    elif bound == LOWER_BOUND:
+                        alpha = max(alpha, value)
+                    else:
+                        beta = min(beta, value)
+
+                    if alpha >= beta:
+                        self.pv_lines[ply] = [table_move]
+                        return value, table_move
+
+        # The move of the principal variation of the previous iteration (or of the table) is tried first
+        first_move = table_move
+        if self._follow_pv:
+            if ply < len(self.principal_variation):
+                first_move = self.principal_variation[ply]
+            else:
+                self._follow_pv = False
+
+        move_order = self.move_order if first_move is None else [first_move] + [
+            column for column in self.move_order if column != first_move]
+
+        for column in move_order:
+            if not position.move_allowed(column):
+                continue
+
+            self.pv_lines[ply + 1] = []
+
+            position.play(column, player)
+
+            try:
+                if position.is_winning(player):
+                    value = WIN_VALUE - ply
+                elif position.is_full():
+                    value = 0
+                elif depth == 1:
+                    value = player * self.evaluate(position)
+                else:
+                    value = -self.negamax(position, -player, depth - 1, -beta, -alpha, ply + 1)[0]
+            finally:
+                position.undo(column, player)
+
+            # Only the first move can continue the previous principal variation
+            self._follow_pv = False
+
+            if best_value is None or value > best_value:
+                best_value = value
+                best_column = column
+                self.pv_lines[ply] = [column] + self.pv_lines[ply + 1]
+
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                # The opponent will avoid this position
+                break
+
+        if self.transposition_table is not None:
+            if best_value <= original_alpha:
+                bound = UPPER_BOUND
+            elif best_value >= beta:
+                bound = LOWER_BOUND
+            else:
+                bound = EXACT
+
+            self.transposition_table.store(key, self._to_table_value(best_value, ply), depth, bound,
+                                           self.x_size - 1 - best_column if mirrored else best_column)
+
+        return best_value, best_column
+
+    def _to_table_value(self, value, ply):
+        """Win values are stored relative to the position (plies to the end instead of plies from the root)."""
+        if value > WIN_BOUND:
+            return value + ply
+        elif value < -WIN_BOUND:
+            return value - ply
+        return value
+
+    def _from_table_value(self, value, ply):
+        """Inverse of _to_table_value."""
+        if value > WIN_BOUND:
+            return value - ply
+        elif value < -WIN_BOUND:
+            return value + ply
+        return value
+
+
+class EndgameSolver:
+    def __init__(self, x_size=7, transposition_table=None):
+        """Solves positions by searching all moves to the end of the game.
+
+        Values are the number of empty cells left after the winning move plus one (positive if the player to
+        move wins, negative if it loses, 0 for a draw). This value does not depend on the plies from the root,
+        so it can be stored in the transposition table as it is. The exact value is found with null window
+        searches (alpha + 1 == beta) that halve the range of possible values.
+
+        :param x_size: Number of columns of the positions to solve.
+        :param transposition_table: TranspositionTable to remember solved positions in (optional).
+        """
+        self.x_size = x_size
+        self.transposition_table = transposition_table if transposition_table is not None else TranspositionTable()
+
+        self.move_order = sorted(range(x_size), key=lambda column: abs(2*column - (x_size - 1)))
+
+        # Number of positions visited by the last solve
+        self.nodes = 0
+
+        # Deadline (time.perf_counter) of a time bounded solve, None if the solve is not time bounded
+        self.deadline = None
+
+    def solve(self, position, player, time_budget=None):
+        """Solves a position that is not finished.
+
+        :param position: Position to solve (it is restored when the search is done).
+        :param player: The player who moves this turn.
+        :param time_budget: Time budget in milliseconds (optional). If the position is not solved in time a
+                            SearchTimeout is raised.
+
+        :returns: Tuple of (result for player (1 win, -1 loss, 0 draw), plies to the end of the game, best column).
+        """
+        self.nodes = 0
+        empty = position.x_size * position.y_size - sum(position.heights)
+
+        # Null window searches until the value is known
+        minimum = -empty
+        maximum = empty
+
+        if time_budget is not None:
+            self.deadline = time.perf_counter() + time_budget / 1000.0
+
+        try:
+            while minimum < maximum:
+                middle = minimum + (maximum - minimum) // 2
+
+                # Test values closer to the bounds, wins or losses with many empty cells left are faster to refute
+                if middle <= 0 and minimum // 2 < middle:
+                    middle = minimum // 2
+                elif middle >= 0 and maximum // 2 > middle:
+                    middle = maximum // 2
+
+                value = self.negamax(position, player, empty, middle, middle + 1)
+
+                if value <= middle:
+                    maximum = value
+                else:
+                    minimum = value
+
+            value = minimum
+
+            # A window around the exact value gives a move that reaches it
+            column = self._best_column(position, player, empty, value)
+        finally:
+            self.deadline = None
+
+        if value > 0:
+            return 1, empty + 1 - value, column
+        elif value < 0:
+            return -1, empty + 1 + value, column
+        return 0, empty, column
+
+    def _best_column(self, position, player, empty, value):
+        """Gives a column whose value is value."""
+        for column in self.move_order:
+            if not position.move_allowed(column):
+                continue
+
+            position.play(column, player)
+
+            try:
+                if position.is_winning(player):
+                    column_value = empty
+                elif empty == 1:
+                    column_value = 0
+                else:
+                    column_value = -self.negamax(position, -player, empty - 1, -value, -value + 1)
+            finally:
+                position.undo(column, player)
+
+            if column_value >= value:
+                return column
+
+    def negamax(self, position, player, empty, alpha, beta):
+        """Value of a position for the player to move, searched to the end of the game.
+
+        :param position: Position to search (not finished).
+        :param player: The player who moves this turn.
+        :param empty: Number of empty cells.
+        :param alpha: Value the player is already guaranteed.
+        :param beta: Value the opponent is already guaranteed (negated).
+
+        :returns: Value for player (exact if it is between alpha and beta, a bound otherwise).
+        """
+        self.nodes += 1
+
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        moves = [column for column in self.move_order if position.move_allowed(column)]
+
+        # A win with the next move is the best value
+        for column in moves:
+            position.play(column, player)
+            winning = position.is_winning(player)
+            position.undo(column, player)
+
+            if winning:
+                return empty
+
+        if empty == 1:
+            # The last cell does not win
+            return 0
+
+        # Without an immediate win the earliest win is two moves later
+        if beta > empty - 2:
+            beta = empty - 2
+            if alpha >= beta:
+                return beta
+
+        key, mirrored = position.key()
+        table_move = None
+        entry = self.transposition_table.probe(key)
+
+        if entry is not None:
+            value, _, bound, table_move = entry
+
+            if mirrored:
+                table_move = self.x_size - 1 - table_move
+
+            if bound == EXACT:
+                return value
+            elif bound == LOWER_BOUND:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+
+            if alpha >= beta:
+                return value
+
+            moves.remove(table_move)
+            moves.insert(0, table_move)
+
+        original_alpha = alpha
+        best_value = None
+        best_column = None
+
+        for column in moves:
+            position.play(column, player)
+            try:
+                value = -self.negamax(position, -player, empty - 1, -beta, -alpha)
+            finally:
+                position.undo(column, player)
+
+            if best_value is None or value > best_value:
+                best_value = value
+                best_column = column
+
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if best_value <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_value >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+
+        self.transposition_table.store(key, best_value, empty, bound,
+                                       self.x_size - 1 - best_column if mirrored else best_column)
+
+        return best_value
+
+
+# Search of a worker process of ParallelSearch, created once per process by _init_worker
+_WORKER_SEARCH = None
+
+
+def _init_worker(x_size, table_memory):
+    """Creates the search of a ParallelSearch worker process.
+
+    :param x_size: Number of columns.
+    :param table_memory: Memory budget in bytes of the transposition table of the worker.
+    """
+    global _WORKER_SEARCH
+
+    _WORKER_SEARCH = AlphaBetaSearch(
+        evaluate=lambda position: position.threat_value,
+        x_size=x_size,
+        transposition_table=TranspositionTable(table_memory))
+
+
+def _search_task(task):
+    """Searches a position in a worker process.
+
+    :param task: Tuple of (position encoding, player to move, depth, ply).
+
+    :returns: Tuple of (value for the player to move, number of searched positions).
+    """
+    encoding, player, depth, ply = task
+    position = Position.decode(encoding)
+
+    _WORKER_SEARCH.nodes = 0
+    value = _WORKER_SEARCH.negamax(position, player, depth, -WIN_VALUE - 1, WIN_VALUE + 1, ply)[0]
+
+    return value, _WORKER_SEARCH.nodes
+
+
+class ParallelSearch:
+    def __init__(self, x_size=7, y_size=6, k=4, workers=None, split_depth=1, table_memory=16 * 2**20):
+        """Negamax search that splits the first plies of the tree across a pool of processes.
+
+        The positions after the first split_depth plies are encoded (Position.encode) and searched with
+        AlphaBetaSearch in the workers, their values are combined with negamax in this process. Leaves are
+        evaluated with Position.threat_value. The pool is started with the first search and kept until close
+        is called (or the with block of the search ends), so workers (and their transposition tables) are
+        reused for every move.
+
+        :param x_size: Number of columns of the positions to search.
+        :param y_size: Number of rows of the positions to search.
+        :param k: Number of tokens in a line that win the game.
+        :param workers: Number of processes (defaults to the number of CPUs).
+        :param split_depth: Number of plies that are split into tasks (1 or 2).
+        :param table_memory: Memory budget in bytes of the transposition table of every worker.
+        """
+        if split_depth not in (1, 2):
+            raise Exception("Invalid value for split_depth: '{}'. Please use 1 or 2.".format(split_depth))
+
+        self.x_size = x_size
+        self.y_size = y_size
+        self.k = k
+        self.workers = workers
+        self.split_depth = split_depth
+        self.table_memory = table_memory
+
+        self.move_order = sorted(range(x_size), key=lambda column: abs(2*column - (x_size - 1)))
+        self.pool = None
+
+        # Number of positions visited by the last search (in all processes)
+        self.nodes = 0
+
+    def best_move(self, position, player, depth):
+        """Searches the best move for a player.
+
+        :param position: Position to search (it is restored when the search is done).
+        :param player: The player who moves this turn.
+        :param depth: Number of plies to look ahead.
+
+        :returns: Tuple of (value for player, column).
+        """
+        # Values of the root moves, replies of a split move are dicts that map every reply to its value
+        values = {}
+        paths = []
+        tasks = []
+
+        for column in self.move_order:
+            if not position.move_allowed(column):
+                continue
+
+            position.play(column, player)
+
+            if position.is_winning(player):
+                values[column] = WIN_VALUE
+            elif position.is_full():
+                values[column] = 0
+            elif depth == 1:
+                values[column] = player * position.threat_value
+            elif self.split_depth == 1 or depth == 2:
+                paths.append((column,))
+                tasks.append((position.encode(), -player, depth - 1, 1))
+            else:
+                values[column] = self._split_replies(position, player, depth, column, paths, tasks)
+
+            position.undo(column, player)
+
+        results = self._get_pool().map(_search_task, tasks) if tasks else []
+        self.nodes = len(tasks) + sum(nodes for _, nodes in results)
+
+        for path, (value, _) in zip(paths, results):
+            if len(path) == 1:
+                values[path[0]] = -value
+            else:
+                values[path[0]][path[1]] = -value
+
+        best_value = None
+        best_column = None
+
+        for column, value in values.items():
+            if isinstance(value, dict):
+                # Value of the move is the negated value of the best reply
+                value = -max(value.values())
+
+            if best_value is None or value > best_value:
+                best_value = value
+                best_column = column
+
+        return best_value, best_column
+
+    def _split_replies(self, position, player, depth, column, paths, tasks):
+        """Creates the tasks for all replies to a root move.
+
+        :param position: Position after the root move.
+        :param player: The player who made the root move.
+        :param depth: Depth of the whole search.
+        :param column: Column of the root move.
+        :param paths: List the (column, reply) of every new task is appended to.
+        :param tasks: List the new tasks are appended to.
+
+        :returns: Dict of the values (for the opponent) of the replies that are known without search.
+        """
+        replies = {}
+
+        for reply in self.move_order:
+            if not position.move_allowed(reply):
+                continue
+
+            position.play(reply, -player)
+
+            if position.is_winning(-player):
+                replies[reply] = WIN_VALUE - 1
+            elif position.is_full():
+                replies[reply] = 0
+            else:
+                replies[reply] = None
+                paths.append((column, reply))
+                tasks.append((position.encode(), player, depth - 2, 2))
+
+            position.undo(reply, -player)
+
+        return replies
+
+    def _get_pool(self):
+        """Starts the process pool with the first search."""
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.workers, initializer=_init_worker,
+                                             initargs=(self.x_size, self.table_memory))
+        return self.pool
+
+    def close(self):
+        """Stops the process pool (it is started again by the next search)."""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,252 @@
+import json
+
+import numpy as np
+import pytest
+
+from connect_four import ConnectFour
+from project_02.evaluation import WindowEvaluator
+from project_02.mcts import MonteCarloTreeSearch
+from project_02.position import Position
+from project_02.search import WIN_BOUND, EndgameSolver, SearchTimeout
+
+
+# Games that are not finished, the moves are the columns of the tokens
+GAMES = [
+    [4, 1],
+    [2, 3, 1, 4, 2, 5],
+    [3, 6, 5, 0, 1, 5, 3, 0],
+    [5, 6, 4, 5, 1, 0, 3, 3],
+    [3, 3, 1, 5, 6, 6, 3, 4, 5],
+    [5, 5, 5, 6, 2, 4, 6, 1, 4, 0]
+]
+
+
+def play_moves(game, moves):
+    """Makes the moves of a game on a ConnectFour instance."""
+    for column in moves:
+        game.make_a_move(column)
+
+    return game
+
+
+@pytest.mark.parametrize("moves", GAMES)
+def test_alpha_beta_matches_tree_search(moves):
+    """Alpha beta picks the move of the full tree for the same depth and evaluation."""
+    game = play_moves(ConnectFour(evaluation="windows", endgame_threshold=None), moves)
+
+    tree = game.move_tree_data(game.position, game.player, depth=2)
+    tree_value, tree_column = tree.calculate_mmv(minmax=game.player)
+    value, column = game.alpha_beta.best_move(game.position, game.player, depth=3)
+
+    assert column == tree_column
+
+    # The tree values wins with the evaluation, alpha beta with WIN_VALUE
+    if abs(value) < WIN_BOUND:
+        assert value * game.player == tree_value
+
+    assert game.position.moves == moves
+
+
+@pytest.mark.parametrize("moves", GAMES)
+def test_tree_leaves_are_valued_in_one_batch(moves, monkeypatch):
+    """The leaves of the tree search get the windows values of their positions from one WindowEvaluator call."""
+    game = play_moves(ConnectFour(evaluation="windows"), moves)
+    calls = []
+
+    evaluate_boards = game.window_evaluator.evaluate_boards
+    monkeypatch.setattr(game.window_evaluator, "evaluate_boards",
+                        lambda boards: calls.append(len(boards)) or evaluate_boards(boards))
+
+    root = game.move_tree_data(game.position, game.player, depth=1)
+    leaves = 0
+
+    for child in root.children:
+        game.position.make(child.label)
+
+        for leaf in child.children or [child]:
+            if leaf is not child:
+                game.position.make(leaf.label)
+
+            assert leaf.value == game.position.threat_value
+            leaves += 1
+
+            if leaf is not child:
+                game.position.unmake()
+
+        game.position.unmake()
+
+    assert calls == [leaves]
+    assert game.position.moves == moves
+
+
+@pytest.mark.parametrize("moves", GAMES)
+def test_make_and_unmake_round_trip(moves):
+    """Taking back all moves restores the empty position, keys and window values included."""
+    position = Position()
+    empty = Position()
+
+    for column in moves:
+        position.make(column)
+
+    assert position.moves == moves
+    assert position.threat_value == WindowEvaluator().evaluate_boards([(position.boards[1], position.boards[-1])])[0]
+
+    while position.moves:
+        position.unmake()
+
+    assert position.boards == empty.boards
+    assert position.heights == empty.heights
+    assert (position.hash, position.mirror_hash) == (empty.hash, empty.mirror_hash)
+    assert position.window_counts == empty.window_counts
+    assert position.threat_value == 0
+
+
+def test_mcts_takes_immediate_win():
+    """MCTS finds the move that completes a line."""
+    position = Position()
+    for column in [3, 4, 3, 4, 3, 6]:
+        position.make(column)
+
+    _, column = MonteCarloTreeSearch(seed=1).best_move(position, playouts=500)
+
+    assert column == 3
+    assert position.moves == [3, 4, 3, 4, 3, 6]
+
+
+@pytest.mark.parametrize("moves, result", [
+    ([3, 4, 3, 4, 3, 4], (1, 1, 3)),  # Three in column 3, the player to move wins with the next move
+    ([2, 2, 3, 3, 4], (-1, 2, 3))     # Open three of the other player in the bottom row, it can not be stopped
+])
+def test_endgame_solver_known_results(moves, result):
+    """The solver proves known wins and losses with their distance."""
+    position = Position()
+    for column in moves:
+        position.make(column)
+
+    assert EndgameSolver().solve(position, position.player_to_move()) == result
+    assert position.moves == moves
+
+
+def test_endgame_solver_time_budget():
+    """A solve that runs out of time raises SearchTimeout and restores the position."""
+    position = Position()
+    for column in GAMES[-1]:
+        position.make(column)
+    key = position.key()
+
+    with pytest.raises(SearchTimeout):
+        EndgameSolver().solve(position, position.player_to_move(), time_budget=0)
+
+    assert position.key() == key
+    assert position.moves == GAMES[-1]
+
+
+def test_opening_book_checks_board(tmp_path):
+    """A book is only loaded by games of its board size and k."""
+    filename = str(tmp_path / "opening_book")
+
+    game = ConnectFour(5, 4)
+    game.build_opening_book(plies=1, depth=2, filename=filename)
+
+    assert game.opening_book.lookup(game.position) is not None
+
+    with pytest.raises(Exception, match="opening book"):
+        ConnectFour(5, 4, k=3).load_opening_book(filename)
+
+    with pytest.raises(Exception, match="opening book"):
+        ConnectFour(6, 4).load_opening_book(filename)
+
+
+def test_opening_book_has_own_search(tmp_path):
+    """Building a book keeps the transposition table of the MMV moves, the evaluation is stored with the book."""
+    filename = str(tmp_path / "opening_book")
+
+    game = ConnectFour(5, 4, endgame_threshold=None)
+    play_moves(game, [2, 2])
+    game.make_mmv_move(player=game.player, max_depth=2, search="alphabeta")
+    table = game.transposition_table.statistics()
+
+    game.build_opening_book(plies=1, depth=2, filename=filename)
+
+    assert game.transposition_table.statistics() == table
+
+    with open(filename + ".json") as infile:
+        config = json.load(infile)
+
+    assert config["evaluation"] == "windows"
+
+    config["evaluation"] = "directions"
+    with open(filename + ".json", "w") as outfile:
+        json.dump(config, outfile)
+
+    with pytest.raises(Exception, match="directions evaluation"):
+        game.load_opening_book(filename)
+
+
+def test_parallel_search_pool_is_closed():
+    """The worker pool is stopped at the end of a with block and of a tournament."""
+    with ConnectFour(workers=1) as game:
+        game.make_mmv_move(player=1, max_depth=1, search="parallel")
+
+        assert game.parallel_search.pool is not None
+
+    assert game.parallel_search.pool is None
+
+    game.play_a_tournament(use_mmv=True, laps=1, search="parallel", max_depth=1)
+
+    assert game.parallel_search.pool is None
+
+
+def check_tournament_statistics(game, laps):
+    """The statistics of a tournament count every game once and every move of the counted player once."""
+    assert set(game.stats['winning_player']) == {1, -1}
+    assert set(game.stats['used_columns']) == set(range(game.x_size))
+    assert set(game.stats['win_direction']) == {'h', 'v', 'd', 'i'}
+    assert len(game.stats['win_turn_count']) == laps
+
+    wins = sum(game.stats['winning_player'].values())
+
+    assert wins + game.stats['draw'] == laps
+    assert sum(game.stats['win_direction'].values()) == wins
+    assert sum(game.stats['used_columns'].values()) == sum(game.stats['win_turn_count'])
+    assert len(game.stats['win_moves']) == wins
+
+
+def test_batch_tournament_statistics():
+    """A batch tournament with a fixed seed gives consistent statistics for all its games."""
+    np.random.seed(3)
+    game = ConnectFour()
+
+    statistics = game.play_a_batch_tournament(laps=250, batch_size=100, print_batches=False, record_moves=True)
+
+    assert sum(statistics.values()) == 250
+    assert statistics[0] == game.stats['draw']
+    assert {1: statistics[1], -1: statistics[-1]} == game.stats['winning_player']
+
+    check_tournament_statistics(game, 250)
+
+
+def test_win_with_last_free_cell_is_no_draw():
+    """A move that fills the board and completes a line wins the game, in single games and batches."""
+    game = play_moves(ConnectFour(3, 1, k=2), [0, 2, 1])
+
+    assert game.game_finished and not game.is_draw
+    assert game.player == 1
+
+    # On this board 'Y' can only win with its second token, which fills the board
+    np.random.seed(0)
+    game = ConnectFour(3, 1, k=2)
+
+    statistics = game.play_a_batch_tournament(laps=50, batch_size=20, print_batches=False, record_moves=True)
+
+    assert statistics[1] > 0 and statistics[-1] == 0
+    assert statistics[1] == game.stats['win_direction']['h']
+    assert all(sorted(moves) in ([0, 1], [1, 2]) for moves in game.stats['win_moves'])
+
+    check_tournament_statistics(game, 50)
+
+    game = ConnectFour(3, 1, k=2)
+    game.play_a_tournament(laps=50, modulo=50)
+
+    assert game.stats['winning_player'][1] > 0
+    check_tournament_statistics(game, 50)
@@ -0,0 +1,193 @@
+import json
+
+import numpy as np
+import pytest
+
+from tic_tac_toe import TicTacToe, BitBoardTicTacToe, MNKGame, StateIndex
+
+
+# Counts of the full Tic-Tac-Toe game tree: wins of 'x', wins of 'o', draws and nodes below the root
+X_WINS = 131184
+O_WINS = 77904
+DRAWS = 46080
+NODES = 549945
+
+
+def test_bitboard_and_array_game_trees_match():
+    """Both backends count the same full game tree."""
+    array_game = TicTacToe()
+    bitboard_game = BitBoardTicTacToe()
+
+    array_counts = array_game.build_game_tree(array_game.S, 1)
+    bitboard_counts = bitboard_game.build_game_tree(bitboard_game.S, 1)
+
+    assert array_counts == bitboard_counts
+    assert array_counts[:3] == ({1: X_WINS, -1: O_WINS}, DRAWS, NODES)
+
+
+def test_symmetric_game_graph():
+    """Symmetric boards collapse into 627 states, which stand for 4520 boards."""
+    game = TicTacToe()
+
+    graph = game.build_game_graph(game.S, 1, state_index=StateIndex())[4]
+
+    assert game.graph_state_counts(graph) == (4520, 627)
+
+
+def test_memoized_count_matches_full_tree():
+    """count_game_tree gives the counts of the full game tree."""
+    game = TicTacToe()
+
+    win, draw, branches, _ = game.count_game_tree(game.S, 1)
+
+    assert (win, draw, branches) == ({1: X_WINS, -1: O_WINS}, DRAWS, NODES)
+
+
+def test_perfect_play():
+    """Tic-Tac-Toe is a draw, perfect play of 'x' never loses against a random 'o'."""
+    game = TicTacToe()
+    game.solve_game(store_to_file=False)
+
+    # Index 0 is the empty board
+    assert game.perfect_play_data[0, 0] == 0
+    assert game.evaluate_strategy("m")[-1] == 0
+
+
+@pytest.mark.parametrize("game_class", [TicTacToe, BitBoardTicTacToe])
+def test_moves_on_game_field_keep_history(game_class):
+    """Moves given self.S update the running state, so wins are found and every move can be taken back."""
+    game = game_class()
+
+    game.move_specific(game.S, 1, (0, 0))
+    game.move_specific(game.S, -1, (1, 1))
+    game.move_specific(game.S, 1, (0, 1))
+    game.move_at_random(moving_player=-1)
+
+    assert len(game.move_history) == 4
+    assert not game.move_was_winning_move(moving_player=-1)
+
+    while game.move_history:
+        game.take_back()
+
+    assert not any(game.S[x, y] for x in range(3) for y in range(3))
+
+    game.move_specific(game.S, 1, (0, 0))
+    game.move_specific(game.S, 1, (0, 1))
+    game.move_specific(game.S, 1, (0, 2))
+
+    assert game.move_was_winning_move(moving_player=1)
+
+
+def test_mnk_game_on_other_board():
+    """Both state graphs of a 4x4 board with k=3 have the same states, perfect play is refused."""
+    game = MNKGame(4, 4, 3)
+    field = np.zeros((4, 4), dtype=int)
+    field.ravel()[:9] = [1, -1, 1, -1, 1, -1, -1, 1, -1]
+
+    graph = game.build_game_graph(field, 1)[4]
+    state_graph = game.build_state_graph(field, 1)
+
+    # The graph of build_game_graph has no nodes for finished games
+    assert graph.number_of_nodes() == np.count_nonzero(~state_graph.terminal)
+
+    with pytest.raises(Exception, match="Perfect play is only available"):
+        game.solve_game(store_to_file=False)
+
+    with pytest.raises(Exception, match="Perfect play is only available"):
+        game.make_perfect_move()
+
+
+def test_probability_tables_of_json_files(tmp_path):
+    """Tables of the former JSON format load like the .npy tables of normalize_statistics."""
+    game = TicTacToe()
+    game.S_stats = np.arange(1, 10).reshape(3, 3)
+    game.normalize_statistics(store_to_file=False, name="normalized")
+
+    filename = str(tmp_path / "normalized_data")
+    with open(filename + ".json", "w") as outfile:
+        json.dump({'mapping': {index: divmod(index, 3) for index in range(9)},
+                   'p': list(game.probability_data.ravel())}, outfile)
+
+    game.learn_from_statistics(filename, name="json")
+    game.load_probability_tables(filename)
+
+    assert np.allclose(game.probability_tables["json"], game.probability_tables["normalized"])
+    assert np.allclose(game.probability_tables["normalized_data"], game.probability_tables["normalized"])
+
+
+def test_mnk_game_tree_count_uses_k_of_game():
+    """count_game_tree counts the game of the instance, not Tic-Tac-Toe."""
+    game = MNKGame(2, 3, 2)
+
+    assert game.count_game_tree(game.S, 1) == game.build_game_tree(game.S, 1)
+
+
+@pytest.mark.parametrize("game_class", [TicTacToe, BitBoardTicTacToe])
+def test_state_graph_backends(game_class):
+    """The state graph of both backends has all 5478 legal Tic-Tac-Toe states."""
+    game = game_class()
+
+    assert game.build_state_graph(game.S, 1).number_of_nodes() == 5478
+
+
+def test_mnk_state_graph_uses_k_of_game():
+    """build_state_graph builds the game of the instance, not Tic-Tac-Toe."""
+    game = MNKGame(2, 4, 2)
+
+    graph = game.build_game_graph(game.S, 1)[4]
+    state_graph = game.build_state_graph(game.S, 1)
+
+    assert graph.number_of_nodes() == np.count_nonzero(~state_graph.terminal)
+
+
+def test_batch_tournament_statistics():
+    """Every game of a batch tournament is counted once and every winning line adds k cells to S_stats."""
+    game = TicTacToe()
+    game.rng = np.random.default_rng(0)
+
+    statistics = game.play_a_batch_tournament(laps=2500, batch_size=1000, print_batches=False)
+    wins = statistics[1] + statistics[-1]
+
+    assert sum(statistics.values()) == 2500
+    assert game.game_stats == statistics
+    assert game.games_played == 2500
+
+    # A move can complete two lines at once
+    assert game.S_stats.sum() % game.k == 0
+    assert wins * game.k <= game.S_stats.sum() <= 2 * wins * game.k
+
+
+def test_parallel_tournament_does_not_depend_on_workers():
+    """For a fixed seed one and two workers play the same games, their statistics are merged into the game."""
+    results = []
+
+    for workers in (1, 2):
+        game = TicTacToe()
+        statistics = game.play_a_parallel_tournament(laps=300, workers=workers, seed=7, shard_size=50)
+        results.append((statistics, game))
+
+    (statistics, game), (other_statistics, other_game) = results
+
+    assert statistics == other_statistics
+    assert np.array_equal(game.S_stats, other_game.S_stats)
+
+    assert sum(statistics.values()) == 300
+    assert game.game_stats == statistics
+    assert game.games_played == 300
+    assert game.S_stats.sum() > 0
+
+
+def test_evaluated_strategy_matches_tournament():
+    """The exact outcome of the heuristic strategy matches a tournament, a function making the same moves agrees."""
+    game = TicTacToe()
+    game.probability_data = np.arange(9).reshape(3, 3) / 36
+    game.rng = np.random.default_rng(0)
+
+    outcome = game.evaluate_strategy("h")
+    statistics = game.play_a_tournament(laps=4000, printing_modulo=4000, random=False, x_player_method="h")
+
+    assert sum(outcome.values()) == pytest.approx(1)
+    for result in (1, -1, 0):
+        assert statistics[result] / 4000 == pytest.approx(outcome[result], abs=0.03)
+
+    assert game.evaluate_strategy(lambda g: g.make_evaluated_move()) == outcome
@@ -1,23 +1,72 @@
 import json
+import multiprocessing
+import os
 
 import numpy as np
 import networkx as nx
 import matplotlib.pyplot as plt
 
-from hashlib import sha1
 from copy import copy as cp
 
 
+def line_masks(rows, columns, k):
+    """Gives the bit masks of all lines of length k on a rows x columns board.
+
+    The bit index of a cell is columns*row + column.
+
+    :param rows: Number of rows of the board.
+    :param columns: Number of columns of the board.
+    :param k: Number of cells in a line.
+
+    :returns: List of (mask, alignment) tuples, the alignment is one of 'h', 'v', 'd' or 'i'.
+    """
+    masks = []
+    for alignment, (row_step, column_step) in [("h", (0, 1)), ("v", (1, 0)), ("d", (1, 1)), ("i", (1, -1))]:
+        for row in range(rows):
+            for column in range(columns):
+                end_row = row + (k-1)*row_step
+                end_column = column + (k-1)*column_step
+                if end_row < rows and 0 <= end_column < columns:
+                    mask = 0
+                    for i in range(k):
+                        mask |= 1 << (columns*(row + i*row_step) + column + i*column_step)
+                    masks.append((mask, alignment))
+    return masks
+
+
+# Bit masks of all lines on the 3x3 board (bit index of a cell is 3*row + column)
+# together with the alignment that is used for the statistics.
+WIN_MASKS = tuple(line_masks(3, 3, 3))
+
+# Mask of a completely filled board
+FULL_BOARD = 0b111111111
+
+# Lookup table that states for every possible 9-bit player board if it contains a line
+WINNING_BOARDS = [any(board & mask == mask for mask, _ in WIN_MASKS) for board in range(FULL_BOARD + 1)]
+
+# Bit value of every cell
+CELL_BITS = 1 << np.arange(9)
+
+# Base 3 index (x -> 1, o -> 2) of every 9-bit player board, the index of a field is index[x] + 2*index[o]
+BASE3_INDEX = [sum(3**i for i in range(9) if board >> i & 1) for board in range(FULL_BOARD + 1)]
+
+# Cell permutations of the 8 symmetries (rotations and reflections) of the board and the
+# resulting mapping of every 9-bit player board to its symmetric board
+SYMMETRIES = [np.rot90(cells, k).ravel() for cells in [np.arange(9).reshape(3, 3),
+                                                       np.fliplr(np.arange(9).reshape(3, 3))] for k in range(4)]
+SYMMETRIC_BOARDS = [[sum((board >> int(cell) & 1) << i for i, cell in enumerate(symmetry))
+                     for board in range(FULL_BOARD + 1)] for symmetry in SYMMETRIES]
+
+
 class TicTacToe:
 
     def __init__(self):
         """Setup a instance of Tic-Tac-Toe game."""
 
-        # Game field
-        self.S = np.zeros((3, 3), dtype=int)
+        # Game field, line tables and statistics for game field (S_stats)
+        self._setup_board(rows=3, columns=3, k=3)
 
-        # Keep track of statistics for game field (S_stats) and overall winning / loosing (game_stats)
-        self.S_stats = np.zeros((3, 3), dtype=int)
+        # Keep track of overall winning / loosing (game_stats)
         self.game_stats = {
             1: 0,
             -1: 0,
@@ -34,8 +83,44 @@ class TicTacToe:
         # Mapping of player-id to symbol
         self.symbols = {1: 'x', -1: 'o', 0: ' '}
 
-        # Variable to hold probabilities
+        # Source of random numbers for random moves (np.random or a np.random.Generator)
+        self.rng = np.random
+
+        # Variable to hold probabilities (array of the shape of the game field) and all named probability tables
         self.probability_data = None
+        self.probability_tables = {}
+
+        # Variable to hold the perfect play table (see solve_game)
+        self.perfect_play_data = None
+
+    def _setup_board(self, rows, columns, k):
+        """Sets up the game field, the statistics for the game field and the tables of all lines.
+
+        :param rows: Number of rows of the board.
+        :param columns: Number of columns of the board.
+        :param k: Number of cells in a line that wins the game.
+        """
+        self.rows = rows
+        self.columns = columns
+        self.k = k
+
+        # Flat cell indices of every line (#lines x k) and the indices of the lines through every cell
+        masks = line_masks(rows, columns, k)
+        self.lines = np.array([[cell for cell in range(rows*columns) if mask >> cell & 1] for mask, _ in masks])
+        self.cell_lines = [[line for line, (mask, _) in enumerate(masks) if mask >> cell & 1]
+                           for cell in range(rows*columns)]
+
+        # Same as cell_lines as array, padded with the index of an additional line that is never won
+        self.cell_line_table = np.full((rows*columns, max(len(lines) for lines in self.cell_lines)), len(masks))
+        for cell, lines in enumerate(self.cell_lines):
+            self.cell_line_table[cell, :len(lines)] = lines
+
+        self.S = np.zeros((rows, columns), dtype=int)
+        self.S_stats = np.zeros((rows, columns), dtype=int)
+
+        # Running sums of all lines of self.S and the cells of all moves made on it
+        self.line_sums = [0] * len(masks)
+        self.move_history = []
 
     def move_still_possible(self, game_field=None):
         """Checks if a move is still possible."""
@@ -53,8 +138,44 @@ class TicTacToe:
         player = moving_player if moving_player is not None else self.p
 
         xs, ys = np.where(field == 0)
-        i = np.random.permutation(np.arange(xs.size))[0]
-        field[xs[i], ys[i]] = player
+        i = self.rng.permutation(np.arange(xs.size))[0]
+
+        # Moves on self.S have to keep the line sums and the move history in sync
+        if field is self.S:
+            self._place(xs[i], ys[i], player)
+        else:
+            field[xs[i], ys[i]] = player
+
+    def _place(self, x, y, player=None):
+        """Puts a token on self.S and updates the line sums.
+
+        :param x: Row of the cell.
+        :param y: Column of the cell.
+        :param player: Player of the token (defaults to the moving player).
+        """
+        player = player if player is not None else self.p
+        cell = int(self.columns*x + y)
+        self.S[x, y] = player
+
+        for line in self.cell_lines[cell]:
+            self.line_sums[line] += player
+
+        self.move_history.append(cell)
+
+    def take_back(self):
+        """Takes back the last move made on self.S.
+
+        :returns: The cell (columns*x + y) of the move that was taken back.
+        """
+        cell = self.move_history.pop()
+        x, y = divmod(cell, self.columns)
+        player = int(self.S[x, y])
+        self.S[x, y] = 0
+
+        for line in self.cell_lines[cell]:
+            self.line_sums[line] -= player
+
+        return cell
 
     def move_specific(self, game_field, moving_player, position):
         """Makes a move to a given field
@@ -64,7 +185,11 @@ class TicTacToe:
         :param position: Position to move at i.e.: (x, y)
         """
         if game_field[position[0], position[1]] == 0:
-            game_field[position[0], position[1]] = moving_player
+            # Moves on self.S have to keep the line sums and the move history in sync
+            if game_field is self.S:
+                self._place(position[0], position[1], moving_player)
+            else:
+                game_field[position[0], position[1]] = moving_player
 
             return True, game_field, moving_player
         else:
@@ -72,18 +197,10 @@ class TicTacToe:
 
     def make_probability_move(self):
         """Makes a move based on the probability of a cell to be a winning candidate."""
-        xs, ys = np.where(self.S == 0)
-
-        # Initialisation for a maximal statistical value
-        best_probability = 0
-
-        # Get the highest win participation cell from the statistical data
-        for i in range(xs.size):
-            best_probability = np.max([best_probability, self.probability_data['p'][(3*xs[i] + ys[i])]])
-
-        x, y = self.probability_data['mapping'][self.probability_data['p'].index(best_probability)]
+        # Get the empty cell with the highest win participation from the statistical data
+        cell = np.argmax(np.where(self.S == 0, self.probability_data, -1))
 
-        self.S[x, y] = self.p
+        self._place(*divmod(int(cell), self.columns))
 
     def make_evaluated_move(self):
         """Evaluates the move of the player.
@@ -97,61 +214,27 @@ class TicTacToe:
         3. Take cell with highest win contribution.
         """
 
-        # Sums for all rows, columns and diagonals
-        columns = np.sum(self.S, axis=0)
-        rows = np.sum(self.S, axis=1)
-        diagonal = np.sum(np.diag(self.S))
-        inverse_diag = np.sum(np.diag(np.rot90(self.S)))
-
         xs, ys = np.where(self.S == 0)
 
-        # Flag to dertermine a move from strategy 1. & 2.
-        made_a_move = False
+        # Cell of a move from strategy 2.
+        block = None
 
         for i in range(xs.size):
-            # Check for strategy 1. else check for strategy 2.
+            # Check for strategy 1. else check for strategy 2. using the running sums of the lines through the cell.
             # If strategy 1. move was found the loop gets interrupted!
             # If strategy 2. move was found the loop continues to check for strat. 1. moves.
+            sums = [self.line_sums[line] * self.p for line in self.cell_lines[self.columns*xs[i] + ys[i]]]
 
-            if rows[xs[i]] == 2 or columns[ys[i]] == 2:
-                x = xs[i]
-                y = ys[i]
-                made_a_move = True
-                break
-
-            elif rows[xs[i]] == -2 or columns[ys[i]] == -2:
-                x = xs[i]
-                y = ys[i]
-                made_a_move = True
-
-            # The diagonal values are dependent on the corner positions (0 & 8) and (2 & 6)
-            position = 3*xs[i] + ys[i]
-
-            if position in [0, 4, 8]:
-                if diagonal == 2:
-                    x = xs[i]
-                    y = ys[i]
-                    made_a_move = True
-                    break
-                elif diagonal == -2:
-                    x = xs[i]
-                    y = ys[i]
-                    made_a_move = True
-
-            if position in [2, 4, 6]:
-                if inverse_diag == 2:
-                    x = xs[i]
-                    y = ys[i]
-                    made_a_move = True
-                    break
-                elif inverse_diag == -2:
-                    x = xs[i]
-                    y = ys[i]
-                    made_a_move = True
-
-        if made_a_move:
-            # A strategy 1. or strategy 2. move was identified
-            self.S[x, y] = self.p
+            if self.k - 1 in sums:
+                self._place(xs[i], ys[i])
+                return
+
+            elif block is None and 1 - self.k in sums:
+                block = (xs[i], ys[i])
+
+        if block is not None:
+            # A strategy 2. move was identified
+            self._place(*block)
         else:
             # No move from strategy 1. or 2. so pick the cell with the highest winning contribution
             self.make_probability_move()
@@ -163,66 +246,29 @@ class TicTacToe:
         :param moving_player: Player to make the move.
         """
 
-        field = game_field if game_field is not None else self.S
         player = moving_player if moving_player is not None else self.p
 
-        game_won = False
-
-        if np.max((np.sum(field, axis=0)) * player) == 3:
-            if game_field is None:
-                self._update_stats("v")
-            game_won = True
+        if game_field is None:
+            # Only the running sums of the lines through the last move of self.S need to be checked
+            game_won = False
 
-        if np.max((np.sum(field, axis=1)) * player) == 3:
-            if game_field is None:
-                self._update_stats("h")
-            game_won = True
+            if self.move_history:
+                for line in self.cell_lines[self.move_history[-1]]:
+                    if self.line_sums[line] * player == self.k:
+                        self._update_stats(line)
+                        game_won = True
 
-        if (np.sum(np.diag(field)) * player) == 3:
-            if game_field is None:
-                self._update_stats("d")
-            game_won = True
+            return game_won
 
-        if (np.sum(np.diag(np.rot90(field))) * player) == 3:
-            if game_field is None:
-                self._update_stats("i")
-            game_won = True
+        return bool(np.any(np.sum(game_field.ravel()[self.lines], axis=1) * player == self.k))
 
-        return game_won
-
-    def _update_stats(self, alignment):
+    def _update_stats(self, line):
         """Helper method to update statistics about cells that contributed to a win.
 
-        :param alignment: One of:
-                            - (v)ertical
-                            - (h)orizontal
-                            - (d)iagonal
-                            - (i)nverse diagonal
+        :param line: Index of the line (see self.lines) that won the game.
         """
-        # ToDo: This is a more or less ugly solution -> Check for a better implementation
-
-        if alignment == "v":
-            vertical_sum = (np.sum(self.S, axis=0)) * self.p
-            column_index = np.argmax(vertical_sum)
-            for row in range(0, 3):
-                self.S_stats[row][column_index] += 1
-
-        elif alignment == "h":
-            horizontal_sum = (np.sum(self.S, axis=1)) * self.p
-            row_index = np.argmax(horizontal_sum)
-            for column in range(0, 3):
-                self.S_stats[row_index][column] += 1
-
-        elif alignment == "d":
-            for index in range(0, 3):
-                self.S_stats[index][index] += 1
-
-        elif alignment == "i":
-            for row, column in [(2, 0), (1, 1), (0, 2)]:
-                self.S_stats[row][column] += 1
-
-        else:
-            raise Exception("Invalid argument for alignment parameter: '{}'".format(alignment))
+        for cell in self.lines[line]:
+            self.S_stats[cell // self.columns][cell % self.columns] += 1
 
     def play_a_game(self, print_every_step=True, random=True, x_player_method="p"):
         """Let two computer players play a game.
@@ -232,6 +278,8 @@ class TicTacToe:
         :param x_player_method: If random is False this parameter determines which approach player X should use:
                                 - (p)robabilistic
                                 - (h)euristic
+                                - (m)inimax (perfect play from the table of solve_game)
+                                - A function that takes the game and makes the move of X on self.S (with _place)
 
         :returns: None if game was a draw or the player who won.
         """
@@ -250,14 +298,7 @@ class TicTacToe:
 
             else:
                 # In a non random tournament the strategy of player 'x' needs to be performed
-                if x_player_method == "p":
-                    self.make_probability_move()
-
-                elif x_player_method == "h":
-                    self.make_evaluated_move()
-
-                else:
-                    raise Exception("Invalid value for x_player_method: '{}'".format(x_player_method))
+                self._make_x_move(x_player_method)
 
             if print_every_step:
                 # A little cheating here, the move happens before the print,
@@ -289,16 +330,42 @@ class TicTacToe:
             self.game_stats[self.p] += 1
             return self.p
 
+    def _make_x_move(self, x_player_method):
+        """Makes a move using the strategy of player X.
+
+        :param x_player_method: Strategy to use (see play_a_game).
+        """
+        if callable(x_player_method):
+            x_player_method(self)
+
+        elif x_player_method == "p":
+            self.make_probability_move()
+
+        elif x_player_method == "h":
+            self.make_evaluated_move()
+
+        elif x_player_method == "m":
+            self.make_perfect_move()
+
+        else:
+            raise Exception("Invalid value for x_player_method: '{}'".format(x_player_method))
+
+    def _last_move_won(self):
+        """Checks if the last move on self.S won the game, without updating any statistics."""
+        return any(self.line_sums[line] * self.p == self.k for line in self.cell_lines[self.move_history[-1]])
+
     def reset_game(self, total_reset=False):
         """Resets the game for another round.
 
         :param total_reset: Flag to completely reset the instance, this includes all collected data.
         """
-        self.S = np.zeros((3, 3), dtype=int)
+        self.S = np.zeros((self.rows, self.columns), dtype=int)
+        self.line_sums = [0] * len(self.lines)
+        self.move_history = []
         self.p = 1
 
         if total_reset:
-            self.S_stats = np.zeros((3, 3), dtype=int)
+            self.S_stats = np.zeros((self.rows, self.columns), dtype=int)
             self.game_stats = {
                 1: 0,
                 -1: 0,
@@ -307,6 +374,8 @@ class TicTacToe:
             self.games_played = 0
             self.tournaments_played = 0
             self.probability_data = None
+            self.probability_tables = {}
+            self.perfect_play_data = None
 
     def play_a_tournament(self, laps=1000, printing_modulo=100, random=True, x_player_method="p"):
         """Lets two computer players play a tournament.
@@ -317,6 +386,8 @@ class TicTacToe:
         :param x_player_method: If random is False this parameter determines which approach player X should use:
                                 - (p)robabilistic
                                 - (h)euristic
+                                - (m)inimax (perfect play from the table of solve_game)
+                                - A function that takes the game and makes the move of X on self.S (with _place)
 
         :returns: Stats dict for this tournament.
         """
@@ -352,6 +423,206 @@ class TicTacToe:
 
         return tournament_statistics
 
+    def play_a_parallel_tournament(self, laps=100000, workers=None, seed=None, shard_size=1000, random=True,
+                                   x_player_method="p"):
+        """Lets two computer players play a tournament that is distributed over a pool of processes.
+
+        The laps are split into shards of shard_size laps. Every shard gets its own random number generator
+        spawned from the seed, so the results for a fixed seed do not depend on the number of workers.
+        The statistics of all shards are merged into this instance.
+
+        :param laps: Number of laps to play at the tournament.
+        :param workers: Number of processes (defaults to the number of CPUs).
+        :param seed: Seed for the random number generators of the shards.
+        :param shard_size: Number of laps played by one task of a worker.
+        :param random: Determines if the tournament is played with random moves.
+        :param x_player_method: If random is False this parameter determines which approach player X should use
+                                (see play_a_tournament).
+
+        :returns: Stats dict for this tournament.
+        """
+        tournament_statistics = {
+            1: 0,  # Wins of player 1
+            -1: 0,  # Wins of player -1
+            0: 0  # Draws
+        }
+
+        shard_laps = [min(shard_size, laps - lap) for lap in range(0, laps, shard_size)]
+        seeds = np.random.SeedSequence(seed).spawn(len(shard_laps))
+
+        # Data the strategies of player X depend on
+        strategy_data = {
+            'probability_data': self.probability_data,
+            'perfect_play_data': None if self.perfect_play_data is None else np.asarray(self.perfect_play_data)
+        }
+
+        shards = [(type(self), self._game_parameters(), strategy_data, n, seed_sequence, random, x_player_method)
+                  for n, seed_sequence in zip(shard_laps, seeds)]
+
+        with multiprocessing.Pool(workers) as pool:
+            for S_stats, shard_statistics in pool.imap(_play_tournament_shard, shards):
+                self.S_stats += S_stats
+
+                for key, value in shard_statistics.items():
+                    tournament_statistics[key] += value
+                    self.game_stats[key] += value
+
+        print("Tournament results in: \n'{}'\t{}\n'{}'\t{}\nDRAW\t{}".format(self.symbols[1],
+                                                                             tournament_statistics[1],
+                                                                             self.symbols[-1],
+                                                                             tournament_statistics[-1],
+                                                                             tournament_statistics[0]))
+
+        self.games_played += laps
+        self.tournaments_played += 1
+
+        return tournament_statistics
+
+    def _game_parameters(self):
+        """Gives the parameters to create a new instance with the same board configuration."""
+        return {}
+
+    def evaluate_strategy(self, x_player_method="p"):
+        """Computes the exact outcome probabilities of a strategy of player X against a random player O.
+
+        Instead of playing games every reachable state is visited once (memoized by the cells of both players).
+        On the turns of X the strategy is asked for its move, on the turns of O every empty cell has the same
+        probability. The strategy has to be deterministic. The current game is reset.
+
+        :param x_player_method: Strategy of player X (see play_a_game), a built-in one or any function that takes
+                                the game and makes the move of X on self.S with _place.
+
+        :returns: Dict of the probabilities of a win of player 1, a win of player -1 and a draw (0).
+        """
+        self.reset_game()
+        x_wins, o_wins, draws = self._strategy_outcome(x_player_method, {})
+        self.reset_game()
+
+        return {
+            1: x_wins,
+            -1: o_wins,
+            0: draws
+        }
+
+    def _strategy_outcome(self, x_player_method, memo):
+        """Recursive part of evaluate_strategy for the state of self.S, player self.p is about to move.
+
+        :param x_player_method: Strategy of player X (see play_a_game).
+        :param memo: Dict of the outcomes of already visited states.
+
+        :returns: Tuple of the probabilities of (win of X, win of O, draw).
+        """
+        key = (frozenset(self.move_history[0::2]), frozenset(self.move_history[1::2]))
+        if key in memo:
+            return memo[key]
+
+        if self.p == 1:
+            self._make_x_move(x_player_method)
+            outcome = self._move_outcome(x_player_method, memo)
+            self.take_back()
+        else:
+            positions = self._empty_positions(self.S)
+            outcome = (0, 0, 0)
+
+            for position in positions:
+                self._place(*position)
+                outcome = tuple(total + part / len(positions)
+                                for total, part in zip(outcome, self._move_outcome(x_player_method, memo)))
+                self.take_back()
+
+        memo[key] = outcome
+        return outcome
+
+    def _move_outcome(self, x_player_method, memo):
+        """Outcome probabilities after a move of self.p was made, see _strategy_outcome."""
+        if self._last_move_won():
+            return (1, 0, 0) if self.p == 1 else (0, 1, 0)
+
+        if len(self.move_history) == self.rows*self.columns:
+            return 0, 0, 1
+
+        self.p *= -1
+        outcome = self._strategy_outcome(x_player_method, memo)
+        self.p *= -1
+
+        return outcome
+
+    def play_a_batch_tournament(self, laps=1000000, batch_size=100000, print_batches=True):
+        """Lets two random players play a tournament where a whole batch of games is simulated at once.
+
+        Every batch is a (N, rows, columns) array of game fields (stored flat). Move selection, win detection
+        of the lines through the new tokens and the update of self.S_stats are done with vectorized masks over
+        all running games of the batch.
+
+        :param laps: Number of laps to play at the tournament.
+        :param batch_size: Number of games that are simulated at once.
+        :param print_batches: Flag to print the state of the tournament after every batch.
+
+        :returns: Stats dict for this tournament.
+        """
+        tournament_statistics = {
+            1: 0,  # Wins of player 1
+            -1: 0,  # Wins of player -1
+            0: 0  # Draws
+        }
+
+        for lap in range(0, laps, batch_size):
+            n = min(batch_size, laps - lap)
+
+            cells = self.rows*self.columns
+
+            # The additional last cell is never occupied, the additional last line (never won) consists of it
+            fields = np.zeros((n, cells + 1), dtype=int)
+            lines = np.vstack([self.lines, np.full((1, self.k), cells)])
+            winners = np.zeros(n, dtype=int)
+            running = np.arange(n)
+            player = 1
+
+            # Each game of the batch has the same number of moves made, so after a full board all are finished
+            for _ in range(cells):
+                # Random move: the empty cell with the highest random number
+                scores = np.where(fields[running, :-1] == 0, self.rng.random((running.size, cells)), -1)
+                moves = scores.argmax(axis=1)
+                fields[running, moves] = player
+
+                # Win detection of the lines through the new token for the moving player
+                line_cells = lines[self.cell_line_table[moves]]
+                won_lines = np.sum(fields[running[:, None, None], line_cells], axis=2) * player == self.k
+                won = won_lines.any(axis=1)
+
+                # Cells of the winning lines contributed to the win
+                self.S_stats += np.bincount(line_cells[won_lines].ravel(),
+                                            minlength=cells)[:cells].reshape(self.S_stats.shape)
+
+                winners[running[won]] = player
+                running = running[~won]
+                player *= -1
+
+            for winner in [1, -1, 0]:
+                tournament_statistics[winner] += int(np.sum(winners == winner))
+
+            if print_batches:
+                print("=== Lap: {} ===\n'{}'\t{}\n'{}'\t{}\nDRAW\t{}".format(lap + n,
+                                                                             self.symbols[1],
+                                                                             tournament_statistics[1],
+                                                                             self.symbols[-1],
+                                                                             tournament_statistics[-1],
+                                                                             tournament_statistics[0]))
+
+        print("Tournament results in: \n'{}'\t{}\n'{}'\t{}\nDRAW\t{}".format(self.symbols[1],
+                                                                             tournament_statistics[1],
+                                                                             self.symbols[-1],
+                                                                             tournament_statistics[-1],
+                                                                             tournament_statistics[0]))
+
+        for key, value in tournament_statistics.items():
+            self.game_stats[key] += value
+
+        self.games_played += laps
+        self.tournaments_played += 1
+
+        return tournament_statistics
+
     def print_game_state(self):
         """Prints the game state."""
         B = np.copy(self.S).astype(object)
@@ -401,44 +672,91 @@ class TicTacToe:
         plt.title(label)
         plt.show()
 
-    def normalize_statistics(self, store_to_file=True, filename="normalized_data", print_normalization=False):
+    def normalize_statistics(self, store_to_file=True, filename="normalized_data", print_normalization=False,
+                             name=None):
         """Takes the data collected ins self.S_stats and normalizes it to 1.
 
-        :param store_to_file: Determines if normalization should be stored into a JSON file.
+        :param store_to_file: Determines if normalization should be stored into a .npy file.
         :param filename: Name of file to store the normalization in.
         :param print_normalization: Flag that states if the normalized value list should be printed.
+        :param name: If given the table is kept under this name as well (see use_probability_table).
         """
-        total = np.sum(self.S_stats)
-        norm = []
-        mapping = {}
-        for row in range(0, 3):
-            for column in range(0, 3):
-                cell_value = self.S_stats[row][column]
-                norm.append(float(cell_value) / total)
-                mapping[len(norm)-1] = (row, column)
-
-        self.probability_data = {
-            'mapping': mapping,
-            'p': norm
-        }
+        self.probability_data = self.S_stats / np.sum(self.S_stats)
+
+        if name is not None:
+            self.probability_tables[name] = self.probability_data
 
         if print_normalization:
             print("Field\tNormalized value")
-            for index, p in enumerate(norm):
+            for index, p in enumerate(self.probability_data.ravel()):
                 print("{}\t{}".format(index, p))
 
         if store_to_file:
-            with open(filename+'.json', 'w') as outfile:
-                json.dump(self.probability_data, outfile)
+            np.save(filename+'.npy', self.probability_data)
 
-    def learn_from_statistics(self, filename="normalized_data"):
-        """Reads data from JSON file that contains statistical information.
+    def learn_from_statistics(self, filename="normalized_data", name=None):
+        """Reads a probability table from a .npy file that contains statistical information.
 
-        :param filename: Name of file to store the normalization in.
+        Files of the former JSON format (filename.json) are read if there is no .npy file.
+
+        :param filename: Name of file the normalization was stored in.
+        :param name: If given the table is kept under this name as well (see use_probability_table).
+        """
+        if not os.path.exists(filename+'.npy') and os.path.exists(filename+'.json'):
+            self.probability_data = self._read_json_table(filename)
+        else:
+            self.probability_data = np.load(filename+'.npy')
+
+        if name is not None:
+            self.probability_tables[name] = self.probability_data
+
+    def use_probability_table(self, name):
+        """Switches the probability data to a named probability table.
+
+        :param name: Name of the table.
+        """
+        self.probability_data = self.probability_tables[name]
+
+    def save_probability_tables(self, filename="probability_tables"):
+        """Stores all named probability tables side by side into one .npz file.
+
+        :param filename: Name of file to store the tables in.
+        """
+        np.savez(filename+'.npz', **self.probability_tables)
+
+    def load_probability_tables(self, filename="probability_tables"):
+        """Reads all named probability tables of a .npz file.
+
+        If there is no .npz file a table of the former JSON format (filename.json) is read and kept under the
+        name of the file.
+
+        :param filename: Name of file the tables were stored in.
+        """
+        if not os.path.exists(filename+'.npz') and os.path.exists(filename+'.json'):
+            self.probability_tables[os.path.basename(filename)] = self._read_json_table(filename)
+            return
+
+        with np.load(filename+'.npz') as data:
+            for name in data.files:
+                self.probability_tables[name] = data[name]
+
+    def _read_json_table(self, filename):
+        """Reads a probability table of the former JSON format of normalize_statistics.
+
+        The JSON file holds a dict of the probabilities ('p') and the mapping of their indices to cells.
+
+        :param filename: Name of file the normalization was stored in.
+
+        :returns: Array of the shape of the game field.
         """
+        with open(filename+'.json') as infile:
+            data = json.load(infile)
+
+        table = np.zeros((self.rows, self.columns))
+        for index, (row, column) in data['mapping'].items():
+            table[row, column] = data['p'][int(index)]
 
-        with open(filename+".json") as infile:
-            self.probability_data = json.load(infile)
+        return table
 
     def build_game_tree(self, game_field, moving_player):
         """Builds the game tree for tic tac toe.
@@ -492,15 +810,172 @@ class TicTacToe:
 
         return win, draw, branches, states
 
-    def build_game_graph(self, game_field, moving_player, graph=None, parent_hash=None):
+    def solve_game(self, store_to_file=True, filename="perfect_play"):
+        """Computes the minimax value and the best move for every reachable state.
+
+        The states are enumerated layer by layer (number of tokens) and solved backwards starting from the full
+        boards. The result is a (2, 3^9) int8 array indexed by the base 3 index of a field:
+            - row 0: Value of the state, positive if 'x' wins, negative if 'o' wins, 0 for a draw.
+                     The absolute value is 10 - #tokens of the final board, so faster wins are preferred.
+            - row 1: Best cell (3*x + y) for the player to move, -1 for finished or unreachable states.
+
+        :param store_to_file: Determines if the table should be stored into a .npy file.
+        :param filename: Name of file to store the table in.
+        """
+        # All reachable states as (x_board, o_board) by number of tokens
+        layers = [{(0, 0)}]
+        for tokens in range(9):
+            layer = set()
+            for x_board, o_board in layers[-1]:
+                if not (WINNING_BOARDS[x_board] or WINNING_BOARDS[o_board]):
+                    occupied = x_board | o_board
+                    for cell in range(9):
+                        bit = 1 << cell
+                        if not occupied & bit:
+                            layer.add((x_board | bit, o_board) if tokens % 2 == 0 else (x_board, o_board | bit))
+            layers.append(layer)
+
+        table = np.zeros((2, 3**9), dtype=np.int8)
+        table[1] = -1
+
+        for tokens in reversed(range(10)):
+            player = 1 if tokens % 2 == 0 else -1
+
+            for x_board, o_board in layers[tokens]:
+                index = BASE3_INDEX[x_board] + 2*BASE3_INDEX[o_board]
+
+                if WINNING_BOARDS[x_board]:
+                    table[0, index] = 10 - tokens
+                elif WINNING_BOARDS[o_board]:
+                    table[0, index] = tokens - 10
+                elif tokens < 9:
+                    # Children were solved in the previous iteration
+                    occupied = x_board | o_board
+                    best_value = None
+                    for cell in range(9):
+                        if not occupied >> cell & 1:
+                            child = index + (3**cell if player == 1 else 2*3**cell)
+                            value = player*table[0, child]
+                            if best_value is None or value > best_value:
+                                best_value = value
+                                table[1, index] = cell
+                    table[0, index] = player*best_value
+
+        self.perfect_play_data = table
+
+        if store_to_file:
+            np.save(filename+'.npy', table)
+
+    def learn_perfect_play(self, filename="perfect_play"):
+        """Memory-maps the perfect play table of solve_game from a .npy file.
+
+        :param filename: Name of file the table was stored in.
+        """
+        self.perfect_play_data = np.load(filename+'.npy', mmap_mode='r')
+
+    def make_perfect_move(self):
+        """Makes the best move looked up in the perfect play table."""
+        x_board, o_board = self._field_bits(self.S)
+        cell = int(self.perfect_play_data[1, BASE3_INDEX[x_board] + 2*BASE3_INDEX[o_board]])
+
+        self._place(cell // 3, cell % 3)
+
+    def count_game_tree(self, game_field, moving_player, k=None):
+        """Counts the game tree like build_game_tree without enumerating it.
+
+        The results of every distinct position are memoized, so each position is expanded only once and its
+        counts are reused for every path that leads to it. This also works for boards of other sizes.
+
+        :param game_field: Board (ndarray) of any size.
+        :param moving_player: Player who makes the turn.
+        :param k: Number of cells in a line that wins the game (defaults to the k of the game).
+
+        :returns: Same (win, draw, branches, states) tuple as build_game_tree.
+        """
+        k = k if k is not None else self.k
+        rows, columns = game_field.shape
+        cells = game_field.ravel()
+
+        own = sum(1 << int(cell) for cell in np.flatnonzero(cells == moving_player))
+        other = sum(1 << int(cell) for cell in np.flatnonzero(cells == -moving_player))
+
+        masks = [mask for mask, _ in line_masks(rows, columns, k)]
+        cell_masks = [[mask for mask in masks if mask >> cell & 1] for cell in range(rows*columns)]
+
+        if any(other & mask == mask for mask in masks):
+            # The given field was already won by the previous player
+            mover_wins, other_wins, draw, branches, states = 0, 1, 0, 0, 0
+        else:
+            mover_wins, other_wins, draw, branches, states = self._count_position(
+                own, other, (1 << rows*columns) - 1, cell_masks, {})
+
+        win = {
+            moving_player: mover_wins,
+            -moving_player: other_wins
+        }
+
+        return win, draw, branches, states
+
+    def _count_position(self, own, other, full_board, cell_masks, memo):
+        """Memoized counting of count_game_tree on a position that is not won yet.
+
+        :param own: Bits of the player who makes the turn.
+        :param other: Bits of the player who made the last turn.
+        :param full_board: Mask of a completely filled board.
+        :param cell_masks: List of the line masks through every cell.
+        :param memo: Dict of already counted positions.
+
+        :returns: Tuple of (wins of moving player, wins of other player, draws, branches, states).
+        """
+        key = (own, other)
+        if key in memo:
+            return memo[key]
+
+        occupied = own | other
+        if occupied == full_board:
+            memo[key] = (0, 0, 1, 0, 0)
+            return memo[key]
+
+        own_wins, other_wins, draw, branches, states = 0, 0, 0, 0, 1
+
+        for cell, masks in enumerate(cell_masks):
+            bit = 1 << cell
+            if not occupied & bit:
+                branches += 1
+                board = own | bit
+
+                # Only the lines through the new token can be completed
+                if any(board & mask == mask for mask in masks):
+                    own_wins += 1
+                else:
+                    sub_results = self._count_position(other, board, full_board, cell_masks, memo)
+
+                    # The moving player of the child is the other player of this position
+                    own_wins += sub_results[1]
+                    other_wins += sub_results[0]
+                    draw += sub_results[2]
+                    branches += sub_results[3]
+                    states += sub_results[4]
+
+        memo[key] = (own_wins, other_wins, draw, branches, states)
+        return memo[key]
+
+    def build_game_graph(self, game_field, moving_player, graph=None, parent_hash=None, state_index=None):
         """Builds a graph instead of a tree.
 
+        States are keyed by integers of a StateIndex. If the index uses symmetries all rotations and
+        reflections of a board collapse into one node, the node attribute 'orbit' keeps the number of
+        boards it stands for (see graph_state_counts).
+
         :param game_field: Tic Tac Toe board.
         :param moving_player: Player who makes the turn.
         :param graph: A graph object (for recursion)
-        :param parent_hash: The sha1 hash of the parent node (for recursion)
+        :param parent_hash: The state key of the parent node (for recursion)
+        :param state_index: StateIndex to key the states with (defaults to an index without symmetries).
         """
         graph = graph if graph is not None else nx.Graph()
+        state_index = state_index if state_index is not None else StateIndex(use_symmetry=False,
+                                                                             cells=self.rows*self.columns)
 
         win = {
             1: 0,
@@ -515,13 +990,14 @@ class TicTacToe:
         if not self.move_was_winning_move(game_field, prev_player):
             if self.move_still_possible(game_field):
 
-                # Unique state hash
-                state_hash = sha1(game_field).hexdigest()
+                # Unique state key
+                x_board, o_board = self._field_bits(game_field)
+                state_hash = state_index.key(x_board, o_board)
 
                 if state_hash not in graph.nodes:
 
                     # Add state to the graph
-                    graph.add_node(state_hash)
+                    graph.add_node(state_hash, orbit=state_index.orbit(x_board, o_board))
 
                     # Node with children is a state
                     states += 1
@@ -531,14 +1007,14 @@ class TicTacToe:
                     cp_p = cp(moving_player)
 
                     # Get all empty cells
-                    xs, ys = np.where(cp_S == 0)
+                    positions = self._empty_positions(cp_S)
 
                     # Count branches (children)
-                    branches += xs.size
+                    branches += len(positions)
 
-                    for i in range(0, xs.size):
-                        _, new_S, player = self.move_specific(cp(cp_S), cp_p, (xs[i], ys[i]))
-                        sub_results = self.build_game_graph(new_S, player*-1, graph, state_hash)
+                    for position in positions:
+                        _, new_S, player = self.move_specific(cp(cp_S), cp_p, position)
+                        sub_results = self.build_game_graph(new_S, player*-1, graph, state_hash, state_index)
 
                         win[1] += sub_results[0][1]
                         win[-1] += sub_results[0][-1]
@@ -560,6 +1036,565 @@ class TicTacToe:
 
         return win, draw, branches, states, graph
 
+    def build_state_graph(self, game_field, moving_player, k=None):
+        """Builds a compact StateGraph of all states reachable from a game field.
+
+        In contrast to build_game_graph the finished states are nodes as well and the edges are directed from
+        a state to the states after each possible move.
+
+        :param game_field: Board of the game (up to 32 cells).
+        :param moving_player: Player who makes the turn.
+        :param k: Number of cells in a line that wins the game (defaults to the k of the game).
+
+        :returns: StateGraph of the states.
+        """
+        k = k if k is not None else self.k
+        size = self.rows*self.columns
+
+        if size > 32:
+            raise Exception("A state graph can only be built for boards of up to 32 cells.")
+
+        x_board, o_board = self._field_bits(game_field)
+        boards = {
+            1: x_board,
+            -1: o_board
+        }
+
+        masks = [mask for mask, _ in line_masks(self.rows, self.columns, k)]
+        full_board = (1 << size) - 1
+
+        # States are (x_board, o_board, player to move), numbered in the order they were found
+        states = [(boards[1], boards[-1], moving_player)]
+        node_ids = {(boards[1], boards[-1]): 0}
+
+        indptr = [0]
+        indices = []
+        values = []
+        terminal = []
+
+        for x_board, o_board, player in states:
+            previous_board = o_board if player == 1 else x_board
+
+            if any(previous_board & mask == mask for mask in masks):
+                values.append(-player)
+                terminal.append(True)
+            elif x_board | o_board == full_board:
+                values.append(0)
+                terminal.append(True)
+            else:
+                values.append(0)
+                terminal.append(False)
+
+                occupied = x_board | o_board
+                for cell in range(size):
+                    bit = 1 << cell
+                    if not occupied & bit:
+                        child = (x_board | bit, o_board) if player == 1 else (x_board, o_board | bit)
+                        if child not in node_ids:
+                            node_ids[child] = len(states)
+                            states.append(child + (-player,))
+                        indices.append(node_ids[child])
+
+            indptr.append(len(indices))
+
+        return StateGraph(keys=np.array([x_board | o_board << size for x_board, o_board, _ in states],
+                                        dtype=np.uint64),
+                          indptr=np.array(indptr, dtype=np.int64),
+                          indices=np.array(indices, dtype=np.int32),
+                          player=np.array([player for _, _, player in states], dtype=np.int8),
+                          value=np.array(values, dtype=np.int8),
+                          terminal=np.array(terminal, dtype=bool))
+
+    def graph_state_counts(self, graph):
+        """Counts the states of a graph from build_game_graph with and without symmetries.
+
+        :param graph: Graph created by build_game_graph.
+
+        :returns: Tuple of (#states without symmetries, #states with symmetries collapsed).
+        """
+        return sum(orbit for _, orbit in graph.nodes(data='orbit', default=1)), graph.number_of_nodes()
+
+    def _field_bits(self, game_field):
+        """Gives the bits of the cells of player 'x' and player 'o' of a game field.
+
+        :param game_field: Tic Tac Toe board.
+        """
+        cells = game_field.ravel()
+
+        if cells.size != CELL_BITS.size:
+            return (sum(1 << int(cell) for cell in np.flatnonzero(cells == 1)),
+                    sum(1 << int(cell) for cell in np.flatnonzero(cells == -1)))
+
+        return int(CELL_BITS @ (cells == 1)), int(CELL_BITS @ (cells == -1))
+
+    def _empty_positions(self, game_field):
+        """Gives a list of all empty positions (x, y) of a game field.
+
+        :param game_field: Tic Tac Toe board.
+        """
+        xs, ys = np.where(game_field == 0)
+        return list(zip(xs, ys))
+
+
+def _play_tournament_shard(shard):
+    """Plays one shard of play_a_parallel_tournament in a worker process.
+
+    :param shard: Tuple of (game class, game parameters, strategy data, laps, seed sequence, random,
+                  x_player_method).
+
+    :returns: Tuple of (S_stats, stats dict) of the shard.
+    """
+    game_class, game_parameters, strategy_data, laps, seed_sequence, random, x_player_method = shard
+
+    game = game_class(**game_parameters)
+    game.rng = np.random.default_rng(seed_sequence)
+    game.probability_data = strategy_data['probability_data']
+    game.perfect_play_data = strategy_data['perfect_play_data']
+
+    for _ in range(laps):
+        game.play_a_game(print_every_step=False, random=random, x_player_method=x_player_method)
+        game.reset_game()
+
+    return game.S_stats, game.game_stats
+
+
+class StateGraph:
+
+    def __init__(self, keys, indptr, indices, player, value, terminal):
+        """Graph of game states stored as arrays.
+
+        Node i is the i-th state, the ids of its children are indices[indptr[i]:indptr[i+1]] (CSR format).
+        All per node attributes are arrays of the same length as keys.
+
+        :param keys: Key of every state (bits of 'x' in the lower, bits of 'o' in the upper half).
+        :param indptr: Offsets of the children of every node into indices.
+        :param indices: Node ids of the children.
+        :param player: Player to move in every state.
+        :param value: Winner (1, -1) of a finished state, 0 for draws and unfinished states.
+        :param terminal: Flag that states if a state is finished.
+        """
+        self.keys = keys
+        self.indptr = indptr
+        self.indices = indices
+        self.player = player
+        self.value = value
+        self.terminal = terminal
+
+    def number_of_nodes(self):
+        """Number of states in the graph."""
+        return self.keys.size
+
+    def number_of_edges(self):
+        """Number of moves in the graph."""
+        return self.indices.size
+
+    def children(self, node):
+        """Gives the node ids of the states after each possible move of a state.
+
+        :param node: Node id of the state.
+        """
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def save(self, filename="state_graph"):
+        """Stores the graph into a .npz file.
+
+        :param filename: Name of file to store the graph in.
+        """
+        np.savez(filename+'.npz', keys=self.keys, indptr=self.indptr, indices=self.indices, player=self.player,
+                 value=self.value, terminal=self.terminal)
+
+    @classmethod
+    def load(cls, filename="state_graph"):
+        """Reads a graph from a .npz file.
+
+        :param filename: Name of file the graph was stored in.
+        """
+        with np.load(filename+'.npz') as data:
+            return cls(**{name: data[name] for name in data.files})
+
+    def to_networkx(self, max_nodes=100000):
+        """Converts the graph into a networkx.DiGraph, only meant for small graphs.
+
+        :param max_nodes: Maximal number of nodes a graph may have to be converted.
+        """
+        if self.number_of_nodes() > max_nodes:
+            raise Exception("Graph has {} nodes, only graphs of up to {} nodes are converted.".format(
+                self.number_of_nodes(), max_nodes))
+
+        graph = nx.DiGraph()
+        for node in range(self.number_of_nodes()):
+            graph.add_node(node, key=int(self.keys[node]), player=int(self.player[node]),
+                           value=int(self.value[node]), terminal=bool(self.terminal[node]))
+
+        for node in range(self.number_of_nodes()):
+            graph.add_edges_from((node, int(child)) for child in self.children(node))
+
+        return graph
+
+
+class StateIndex:
+
+    def __init__(self, use_symmetry=True, cells=9):
+        """Index that maps Tic-Tac-Toe boards to compact integer keys.
+
+        A key holds the bits of player 'x' in the lower and the bits of player 'o' in the upper bits.
+        Using symmetries every board is mapped to the smallest key of its 8 rotations and reflections.
+
+        :param use_symmetry: Flag to map symmetric boards to the same key (only for the 3x3 board).
+        :param cells: Number of cells of the board.
+        """
+        if use_symmetry and cells != 9:
+            raise Exception("Symmetries are only available for boards of 9 cells, not {}.".format(cells))
+
+        self.use_symmetry = use_symmetry
+        self.cells = cells
+
+        # Cache of canonical keys
+        self.canonical_keys = {}
+
+    def key(self, x_board, o_board):
+        """Gives the key of a board.
+
+        :param x_board: Bits of the cells occupied by player 'x'.
+        :param o_board: Bits of the cells occupied by player 'o'.
+        """
+        key = x_board | o_board << self.cells
+
+        if not self.use_symmetry:
+            return key
+
+        canonical_key = self.canonical_keys.get(key)
+        if canonical_key is None:
+            canonical_key = min(self._symmetric_keys(x_board, o_board))
+            self.canonical_keys[key] = canonical_key
+
+        return canonical_key
+
+    def orbit(self, x_board, o_board):
+        """Gives the number of distinct boards that share the key of this board.
+
+        :param x_board: Bits of the cells occupied by player 'x'.
+        :param o_board: Bits of the cells occupied by player 'o'.
+        """
+        return len(set(self._symmetric_keys(x_board, o_board))) if self.use_symmetry else 1
+
+    def _symmetric_keys(self, x_board, o_board):
+        """Keys of all 8 symmetric boards."""
+        return [boards[x_board] | boards[o_board] << 9 for boards in SYMMETRIC_BOARDS]
+
+
+class BitBoard:
+
+    def __init__(self, x_board=0, o_board=0):
+        """Tic-Tac-Toe field that stores the cells of each player as a 9-bit integer.
+
+        :param x_board: Bits of the cells occupied by player 'x' (1).
+        :param o_board: Bits of the cells occupied by player 'o' (-1).
+        """
+        self.boards = {1: x_board, -1: o_board}
+
+    @property
+    def occupied(self):
+        """Bits of all occupied cells."""
+        return self.boards[1] | self.boards[-1]
+
+    def empty_cells(self):
+        """List of the bit indices of all empty cells."""
+        occupied = self.occupied
+        return [i for i in range(9) if not occupied >> i & 1]
+
+    def key(self):
+        """Unique integer key of the field (x bits in the lower, o bits in the upper half)."""
+        return self.boards[1] | self.boards[-1] << 9
+
+    def to_array(self):
+        """Converts the field into the 3x3 ndarray representation of TicTacToe."""
+        field = np.zeros((3, 3), dtype=int)
+        for player, board in self.boards.items():
+            for i in range(9):
+                if board >> i & 1:
+                    field[i // 3, i % 3] = player
+        return field
+
+    def __getitem__(self, position):
+        """Gives the player on a cell, i.e.: field[x, y]"""
+        bit = 1 << (3*position[0] + position[1])
+        if self.boards[1] & bit:
+            return 1
+        elif self.boards[-1] & bit:
+            return -1
+        return 0
+
+    def __copy__(self):
+        return BitBoard(self.boards[1], self.boards[-1])
+
+
+class BitBoardTicTacToe(TicTacToe):
+
+    def __init__(self):
+        """Setup a instance of Tic-Tac-Toe game that uses a BitBoard as game field.
+
+        The API is the same as for TicTacToe, only the game field (self.S) is a BitBoard instead of a ndarray.
+        """
+        super().__init__()
+        self.S = BitBoard()
+
+    def move_still_possible(self, game_field=None):
+        """Checks if a move is still possible."""
+        field = game_field if game_field is not None else self.S
+
+        return field.occupied != FULL_BOARD
+
+    def move_at_random(self, game_field=None, moving_player=None):
+        """Make a random move.
+
+        :param game_field: Field to make the move on.
+        :param moving_player: Player to make the move.
+        """
+        field = game_field if game_field is not None else self.S
+        player = moving_player if moving_player is not None else self.p
+
+        cells = field.empty_cells()
+        cell = cells[int(self.rng.random() * len(cells))]
+
+        # Moves on self.S have to keep the move history in sync
+        if field is self.S:
+            self._place(cell // 3, cell % 3, player)
+        else:
+            field.boards[player] |= 1 << cell
+
+    def _place(self, x, y, player=None):
+        """Puts a token on self.S.
+
+        :param x: Row of the cell.
+        :param y: Column of the cell.
+        :param player: Player of the token (defaults to the moving player).
+        """
+        player = player if player is not None else self.p
+        cell = int(3*x + y)
+        self.S.boards[player] |= 1 << cell
+        self.move_history.append(cell)
+
+    def take_back(self):
+        """Takes back the last move made on self.S.
+
+        :returns: The cell (3*x + y) of the move that was taken back.
+        """
+        cell = self.move_history.pop()
+        for player in self.S.boards:
+            self.S.boards[player] &= ~(1 << cell)
+
+        return cell
+
+    def move_specific(self, game_field, moving_player, position):
+        """Makes a move to a given field
+
+        :param game_field:
+        :param moving_player:
+        :param position: Position to move at i.e.: (x, y)
+        """
+        bit = 1 << (3*position[0] + position[1])
+
+        if not game_field.occupied & bit:
+            # Moves on self.S have to keep the move history in sync
+            if game_field is self.S:
+                self._place(position[0], position[1], moving_player)
+            else:
+                game_field.boards[moving_player] |= bit
+
+            return True, game_field, moving_player
+        else:
+            return False
+
+    def make_probability_move(self):
+        """Makes a move based on the probability of a cell to be a winning candidate."""
+        cells = self.S.empty_cells()
+
+        # Take the empty cell with the highest win participation
+        cell = max(cells, key=lambda i: self.probability_data.flat[i])
+
+        self._place(cell // 3, cell % 3)
+
+    def make_evaluated_move(self):
+        """Evaluates the move of the player.
+
+        1. Is player able to win with this move?
+
+        if not:
+        2. Is other player able to win with the next move?
+
+        if not:
+        3. Take cell with highest win contribution.
+        """
+        own = self.S.boards[self.p]
+        other = self.S.boards[-self.p]
+        block = None
+
+        for cell in self.S.empty_cells():
+            bit = 1 << cell
+
+            # Strategy 1. interrupts the search, strategy 2. is only remembered
+            if WINNING_BOARDS[own | bit]:
+                self._place(cell // 3, cell % 3)
+                return
+            elif block is None and WINNING_BOARDS[other | bit]:
+                block = cell
+
+        if block is not None:
+            self._place(block // 3, block % 3)
+        else:
+            # No move from strategy 1. or 2. so pick the cell with the highest winning contribution
+            self.make_probability_move()
+
+    def move_was_winning_move(self, game_field=None, moving_player=None):
+        """Checks if a move was a winning move.
+
+        :param game_field: Field to make the move on.
+        :param moving_player: Player to make the move.
+        """
+        field = game_field if game_field is not None else self.S
+        player = moving_player if moving_player is not None else self.p
+
+        board = field.boards[player]
+        game_won = WINNING_BOARDS[board]
+
+        if game_won and game_field is None:
+            for line, (mask, _) in enumerate(WIN_MASKS):
+                if board & mask == mask:
+                    self._update_stats(line)
+
+        return game_won
+
+    def _last_move_won(self):
+        """Checks if the last move on self.S won the game, without updating any statistics."""
+        return WINNING_BOARDS[self.S.boards[self.p]]
+
+    def reset_game(self, total_reset=False):
+        """Resets the game for another round.
+
+        :param total_reset: Flag to completely reset the instance, this includes all collected data.
+        """
+        super().reset_game(total_reset=total_reset)
+        self.S = BitBoard()
+
+    def print_game_state(self):
+        """Prints the game state."""
+        B = self.S.to_array().astype(object)
+        for n in [-1, 0, 1]:
+            B[B == n] = self.symbols[n]
+        print(B)
+
+    def _field_bits(self, game_field):
+        """Gives the bits of the cells of player 'x' and player 'o' of a game field.
+
+        :param game_field: Tic Tac Toe board (BitBoard).
+        """
+        return game_field.boards[1], game_field.boards[-1]
+
+    def _empty_positions(self, game_field):
+        """Gives a list of all empty positions (x, y) of a game field.
+
+        :param game_field: Tic Tac Toe board (BitBoard).
+        """
+        return [(cell // 3, cell % 3) for cell in game_field.empty_cells()]
+
+    def build_game_tree(self, game_field, moving_player):
+        """Builds the game tree for tic tac toe.
+
+        :param game_field: Tic Tac Toe board (BitBoard).
+        :param moving_player: Player who makes the turn.
+        """
+        return self._count_subtree(game_field.boards[moving_player], game_field.boards[-moving_player], moving_player)
+
+    def _count_subtree(self, own, other, moving_player):
+        """Recursive counting of build_game_tree on plain integers.
+
+        :param own: Bits of the player who makes the turn.
+        :param other: Bits of the player who made the last turn.
+        :param moving_player: Player who makes the turn.
+        """
+        win = {
+            1: 0,
+            -1: 0
+        }
+
+        if WINNING_BOARDS[other]:
+            win[-moving_player] += 1
+            return win, 0, 0, 0
+
+        occupied = own | other
+        if occupied == FULL_BOARD:
+            return win, 1, 0, 0
+
+        draw = 0
+        branches = 0
+        states = 1
+
+        for cell in range(9):
+            bit = 1 << cell
+            if not occupied & bit:
+                branches += 1
+                sub_results = self._count_subtree(other, own | bit, -moving_player)
+
+                win[1] += sub_results[0][1]
+                win[-1] += sub_results[0][-1]
+                draw += sub_results[1]
+                branches += sub_results[2]
+                states += sub_results[3]
+
+        return win, draw, branches, states
+
+
+class MNKGame(TicTacToe):
+
+    def __init__(self, rows=15, columns=15, k=5):
+        """Setup a instance of a m,n,k-game (k in a row on a rows x columns board), i.e. Gomoku for 15, 15, 5.
+
+        Game play, tournaments, statistics, the game tree and graph methods and evaluate_strategy work like for
+        TicTacToe, the heuristic move looks for k-1 tokens in a line instead of 2. The perfect play table
+        (solve_game, learn_perfect_play, make_perfect_move) only exists for the 3x3 board with k=3, on other
+        boards these methods raise an exception.
+
+        :param rows: Number of rows of the board.
+        :param columns: Number of columns of the board.
+        :param k: Number of cells in a line that wins the game.
+        """
+        super().__init__()
+        self._setup_board(rows=rows, columns=columns, k=k)
+
+    def move_still_possible(self, game_field=None):
+        """Checks if a move is still possible."""
+        if game_field is None:
+            return len(self.move_history) < self.S.size
+
+        return super().move_still_possible(game_field)
+
+    def _game_parameters(self):
+        """Gives the parameters to create a new instance with the same board configuration."""
+        return {'rows': self.rows, 'columns': self.columns, 'k': self.k}
+
+    def _check_perfect_play(self):
+        """Raises an exception if the perfect play table does not fit the board."""
+        if (self.rows, self.columns, self.k) != (3, 3, 3):
+            raise Exception("Perfect play is only available for the 3x3 board with k=3, not for {}x{} with k={}."
+                            .format(self.rows, self.columns, self.k))
+
+    def solve_game(self, store_to_file=True, filename="perfect_play"):
+        """See TicTacToe.solve_game, only for the 3x3 board with k=3."""
+        self._check_perfect_play()
+        super().solve_game(store_to_file=store_to_file, filename=filename)
+
+    def learn_perfect_play(self, filename="perfect_play"):
+        """See TicTacToe.learn_perfect_play, only for the 3x3 board with k=3."""
+        self._check_perfect_play()
+        super().learn_perfect_play(filename=filename)
+
+    def make_perfect_move(self):
+        """See TicTacToe.make_perfect_move, only for the 3x3 board with k=3."""
+        self._check_perfect_play()
+        super().make_perfect_move()
+
+
 if __name__ == '__main__':
     """If the file is started from console it will work exactly like the original version."""
     ttt = TicTacToe()